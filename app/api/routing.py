@@ -0,0 +1,39 @@
+"""Shared route class for API routers."""
+from typing import Any, Callable, Coroutine
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+
+class ErrorHandlingRoute(APIRoute):
+    """
+    Route that turns unexpected exceptions into 500 HTTPExceptions.
+
+    The handler is wrapped once when the route is built, so endpoints need no
+    per-route decorator. The HTTPException is raised inside the app's exception
+    middleware, which keeps CORS headers on the error response (a global
+    Exception handler would answer from outside the CORS middleware).
+
+    Usage:
+        router = APIRouter(prefix="/endpoint", route_class=ErrorHandlingRoute)
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        route_handler = super().get_route_handler()
+
+        async def error_handling_route_handler(request: Request) -> Response:
+            try:
+                return await route_handler(request)
+            except (StarletteHTTPException, RequestValidationError):
+                # Re-raise HTTPExceptions (FastAPI's subclass included) and validation errors as-is
+                raise
+            except Exception as e:
+                # Extract error message properly
+                error_msg = str(e) or repr(e)
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Internal server error: {error_msg}"
+                )
+
+        return error_handling_route_handler
@@ -10,13 +10,12 @@ from app.models.schemas import (
     UpdatePasswordRequest,
     UpdateGeminiApiKeyRequest,
 )
-from app.decorators import handle_exceptions
+from app.api.routing import ErrorHandlingRoute
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+router = APIRouter(prefix="/auth", tags=["Authentication"], route_class=ErrorHandlingRoute)
 
 
 @router.post("/login")
-@handle_exceptions
 async def login_user(data: LoginRequest):
     """
     Authenticate user with email and password.
@@ -24,11 +23,10 @@ async def login_user(data: LoginRequest):
     Returns:
         Login response with tokens and user info
     """
-    return auth_service.login(data)
+    return await auth_service.login(data)
 
 
 @router.post("/signup")
-@handle_exceptions
 async def signup_user(data: SignupRequest):
     """
     Create new user account.
@@ -36,11 +34,10 @@ async def signup_user(data: SignupRequest):
     Returns:
         Signup response with user info
     """
-    return auth_service.signup(data)
+    return await auth_service.signup(data)
 
 
 @router.post("/google-signup")
-@handle_exceptions
 async def google_signup(data: GoogleSignupRequest):
     """
     Create new user account via Google OAuth.
@@ -48,11 +45,10 @@ async def google_signup(data: GoogleSignupRequest):
     Returns:
         Signup response with user info
     """
-    return auth_service.google_signup(data)
+    return await auth_service.google_signup(data)
 
 
 @router.get("/me")
-@handle_exceptions
 async def get_logged_in_user(current_user: dict = Depends(get_current_user)):
     """
     Get current authenticated user data.
@@ -68,7 +64,6 @@ async def get_logged_in_user(current_user: dict = Depends(get_current_user)):
 
 
 @router.post("/update-me")
-@handle_exceptions
 async def update_profile(
     update_data: UpdateProfileRequest,
     current_user: dict = Depends(get_current_user)
@@ -84,26 +79,27 @@ async def update_profile(
         Updated user data
     """
     uid = current_user["uid"]
-    return auth_service.update_profile(update_data.email, update_data, uid)
+    return await auth_service.update_profile(update_data, uid)
 
 
 @router.post("/update-password")
-@handle_exceptions
-async def update_password(data: UpdatePasswordRequest):
+async def update_password(data: UpdatePasswordRequest, request: Request):
     """
     Update user password.
     
+    A recent bearer token for the same account skips the current-password sign-in.
+    
     Args:
         data: Update password request data
+        request: FastAPI Request (optional Authorization header)
         
     Returns:
         New tokens after password update
     """
-    return auth_service.update_password(data)
+    return await auth_service.update_password(data, request)
 
 
 @router.post("/settings/gemini-api-key")
-@handle_exceptions
 async def save_gemini_api_key(
     data: UpdateGeminiApiKeyRequest,
     current_user: dict = Depends(get_current_user),
@@ -117,7 +113,6 @@ async def save_gemini_api_key(
 
 
 @router.get("/settings/gemini-api-key")
-@handle_exceptions
 async def get_gemini_api_key_status(current_user: dict = Depends(get_current_user)):
     """
     Return whether the user has a Gemini API key set (key is never returned).
@@ -128,7 +123,6 @@ async def get_gemini_api_key_status(current_user: dict = Depends(get_current_use
 
 
 @router.delete("/settings/gemini-api-key")
-@handle_exceptions
 async def remove_gemini_api_key(current_user: dict = Depends(get_current_user)):
     """
     Remove user's Gemini API key from account settings.
@@ -1,15 +1,15 @@
 """Chat API routes."""
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from app.dependencies import get_current_user
 from app.services.chat_service import chat_service
 from app.models.schemas import MessageInput, MessageResponse, SessionResponse, MessagesResponse, DeleteResponse, SessionsListResponse
-from app.decorators import handle_exceptions
+from app.api.routing import ErrorHandlingRoute
 
-router = APIRouter(prefix="/chat", tags=["Chat"])
+router = APIRouter(prefix="/chat", tags=["Chat"], route_class=ErrorHandlingRoute)
 
 
 @router.post("/send-message", response_model=dict)
-@handle_exceptions
 async def send_message(
     data: MessageInput,
     current_user: dict = Depends(get_current_user)
@@ -24,7 +24,7 @@ async def send_message(
     Returns:
         AI response message and session_id
     """
-    result = chat_service.send_message(
+    result = await chat_service.send_message(
         user_id=current_user["uid"],
         message=data.message,
         session_id=data.session_id,
@@ -33,8 +33,27 @@ async def send_message(
     return result
 
 
+@router.post("/send-message/stream")
+async def stream_message(
+    data: MessageInput,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Send chat message and stream the AI response as server-sent events.
+    
+    Each event carries a `text` chunk; the final event has `done`, the full
+    `reply` and the `session_id`.
+    """
+    events = await chat_service.stream_message(
+        user_id=current_user["uid"],
+        message=data.message,
+        session_id=data.session_id,
+        model_name=data.model_name
+    )
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
 @router.get("/sessions", response_model=SessionsListResponse)
-@handle_exceptions
 async def get_all_sessions(
     limit: int = Query(50, ge=1, le=200, description="Maximum number of sessions to return"),
     current_user: dict = Depends(get_current_user)
@@ -50,7 +69,6 @@ async def get_all_sessions(
 
 
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
-@handle_exceptions
 async def get_session(
     session_id: str,
     current_user: dict = Depends(get_current_user)
@@ -66,7 +84,6 @@ async def get_session(
 
 
 @router.get("/sessions/{session_id}/messages", response_model=MessagesResponse)
-@handle_exceptions
 async def get_messages(
     session_id: str,
     limit: int = Query(50, ge=1, le=200, description="Maximum number of messages to return"),
@@ -83,7 +100,6 @@ async def get_messages(
 
 
 @router.delete("/sessions/{session_id}", response_model=DeleteResponse)
-@handle_exceptions
 async def delete_session(
     session_id: str,
     current_user: dict = Depends(get_current_user)
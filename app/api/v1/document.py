@@ -1,15 +1,15 @@
 """Document chat API routes with RAG support."""
 from fastapi import APIRouter, UploadFile, File, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from app.dependencies import get_current_user
 from app.services.document_service import document_service
 from app.models.schemas import QueryRequest, QueryResponse, UploadResponse, ChatRequest, ChatResponse, DeleteResponse
-from app.decorators import handle_exceptions
+from app.api.routing import ErrorHandlingRoute
 
-router = APIRouter(prefix="/document", tags=["Document Chat"])
+router = APIRouter(prefix="/document", tags=["Document Chat"], route_class=ErrorHandlingRoute)
 
 
 @router.post("/upload", response_model=UploadResponse)
-@handle_exceptions
 async def upload_document(
     file: UploadFile = File(...),
     background_tasks: BackgroundTasks = BackgroundTasks(),
@@ -32,10 +32,8 @@ async def upload_document(
     # Extract user_id from token (never from request)
     user_id = current_user["uid"]
     
-    content = await file.read()
-    result = document_service.upload_document(
-        file_content=content,
-        filename=file.filename or "unknown",
+    result = await document_service.upload_document(
+        file=file,
         user_id=user_id,
         background_tasks=background_tasks
     )
@@ -43,7 +41,6 @@ async def upload_document(
 
 
 @router.get("/{document_id}/status")
-@handle_exceptions
 async def get_document_status(
     document_id: str,
     current_user: dict = Depends(get_current_user)
@@ -59,7 +56,6 @@ async def get_document_status(
 
 
 @router.delete("/{document_id}", response_model=DeleteResponse)
-@handle_exceptions
 async def delete_document(
     document_id: str,
     current_user: dict = Depends(get_current_user)
@@ -75,7 +71,6 @@ async def delete_document(
 
 
 @router.post("/ask", response_model=QueryResponse)
-@handle_exceptions
 async def ask_question(
     req: QueryRequest,
     current_user: dict = Depends(get_current_user)
@@ -93,7 +88,7 @@ async def ask_question(
         Question and answer response
     """
     user_id = current_user["uid"]
-    return document_service.ask_question(
+    return await document_service.ask_question(
         question=req.question,
         document_id=req.task_id,
         user_id=user_id,
@@ -102,8 +97,28 @@ async def ask_question(
     )
 
 
+@router.post("/ask/stream")
+async def stream_question(
+    req: QueryRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Ask question about uploaded document and stream the answer as server-sent events.
+    
+    Each event carries a `text` chunk; the final event has `done` plus the
+    same fields as `/document/ask` (answer, chunks_used, source_documents).
+    """
+    events = await document_service.stream_question(
+        question=req.question,
+        document_id=req.task_id,
+        user_id=current_user["uid"],
+        use_mmr=True,
+        k=5
+    )
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
 @router.post("/chat", response_model=ChatResponse)
-@handle_exceptions
 async def chat(
     req: ChatRequest,
     current_user: dict = Depends(get_current_user)
@@ -123,7 +138,7 @@ async def chat(
     # Use document_id from request if provided, otherwise use task_id for backward compatibility
     document_id = req.document_id if req.document_id else req.task_id
     
-    result = document_service.ask_question(
+    result = await document_service.ask_question(
         question=req.question,
         document_id=document_id,
         user_id=user_id,
@@ -135,7 +150,6 @@ async def chat(
 
 
 @router.post("/cleanup")
-@handle_exceptions
 async def cleanup_orphaned_vectorstores(
     current_user: dict = Depends(get_current_user)
 ):
@@ -143,8 +157,8 @@ async def cleanup_orphaned_vectorstores(
     Clean up orphaned vectorstores (vectorstores without corresponding documents).
     
     This helps free up disk space by removing vectorstores for deleted documents.
-    Only accessible to authenticated users.
+    Only the current user's vectorstores are checked.
     """
-    result = document_service.cleanup_orphaned_vectorstores()
-    return result
+    user_id = current_user["uid"]
+    return await document_service.cleanup_orphaned_vectorstores(user_id)
 
@@ -4,13 +4,12 @@ from fastapi import APIRouter, Depends, Query, HTTPException
 from app.dependencies import get_current_user
 from app.services.help_service import help_service
 from app.models.schemas import HelpQueryRequest, HelpReplyRequest, HelpStatusRequest
-from app.decorators import handle_exceptions
+from app.api.routing import ErrorHandlingRoute
 
-router = APIRouter(prefix="/help", tags=["Help & Support"])
+router = APIRouter(prefix="/help", tags=["Help & Support"], route_class=ErrorHandlingRoute)
 
 
 @router.post("/queries")
-@handle_exceptions
 async def submit_query(
     data: HelpQueryRequest,
     current_user: dict = Depends(get_current_user)
@@ -23,7 +22,6 @@ async def submit_query(
 
 
 @router.get("/queries")
-@handle_exceptions
 async def get_my_queries(current_user: dict = Depends(get_current_user)):
     """
     Get all help queries submitted by the current user.
@@ -33,7 +31,6 @@ async def get_my_queries(current_user: dict = Depends(get_current_user)):
 
 
 @router.get("/queries/all")
-@handle_exceptions
 async def get_all_queries(
     status: Optional[str] = Query(None, description="Filter by status (open, in_progress, resolved, closed)"),
     current_user: dict = Depends(get_current_user)
@@ -46,7 +43,6 @@ async def get_all_queries(
 
 
 @router.post("/queries/{query_id}/reply")
-@handle_exceptions
 async def reply_to_query(
     query_id: str,
     data: HelpReplyRequest,
@@ -60,7 +56,6 @@ async def reply_to_query(
 
 
 @router.patch("/queries/{query_id}/status")
-@handle_exceptions
 async def update_query_status(
     query_id: str,
     data: HelpStatusRequest,
@@ -1,22 +1,70 @@
 """Resume analysis API routes."""
-from fastapi import APIRouter, UploadFile, File, Form, Depends, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, UploadFile, File, Form, Depends, Query, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from app.config import settings
 from app.dependencies import get_current_user
 from app.services.resume_service import resume_service
 from app.services.pdf_service import pdf_service
 from app.models.schemas import GenerateResumeRequest, GeneratePDFRequest
-from app.decorators import handle_exceptions
-import os
-import json
+from app.api.routing import ErrorHandlingRoute
+import orjson
 
-router = APIRouter(prefix="/resume", tags=["Resume"])
+router = APIRouter(prefix="/resume", tags=["Resume"], route_class=ErrorHandlingRoute)
+
+
+def _parse_job_description(job_description: str) -> str:
+    """Unwrap a job description that was sent as a JSON string."""
+    # Plain text (the common case) is never handed to the parser
+    if job_description.lstrip()[:1] not in ('{', '['):
+        return job_description
+    try:
+        parsed = orjson.loads(job_description)
+    except orjson.JSONDecodeError:
+        return job_description
+    if isinstance(parsed, dict):
+        # Only stringify the whole object when the expected key is missing
+        return parsed['job_description'] if 'job_description' in parsed else str(parsed)
+    if isinstance(parsed, list):
+        return ' '.join(map(str, parsed))
+    return job_description
+
+
+async def _read_resume_pdf(file: UploadFile) -> bytes:
+    """Validate a resume upload and read it into memory."""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    file_extension = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
+    if file_extension != 'pdf':
+        raise HTTPException(
+            status_code=400,
+            detail="Only PDF files are supported for resume analysis"
+        )
+    
+    # Read at most one byte past the limit so oversized uploads are never fully loaded into RAM
+    content = await file.read(settings.max_upload_size + 1)
+    if not content:
+        raise HTTPException(status_code=400, detail="Empty file uploaded")
+    if len(content) > settings.max_upload_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Max size: {settings.max_upload_size / 1024 / 1024}MB"
+        )
+    if not content.startswith(b"%PDF"):
+        raise HTTPException(status_code=400, detail="Uploaded file is not a valid PDF")
+    return content
 
 
 @router.post("/compare-resume-jd")
-@handle_exceptions
 async def compare_resume_jd(
     file: UploadFile = File(...),
     job_description: str = Form(...),
+    max_pages: int = Query(
+        settings.resume_analysis_max_pages,
+        ge=1,
+        le=settings.resume_max_pages,
+        description="Number of leading resume pages to analyze"
+    ),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -25,62 +73,79 @@ async def compare_resume_jd(
     Args:
         file: Resume PDF file
         job_description: Job description text
+        max_pages: Number of leading resume pages to analyze
         current_user: Current user data from token (dependency injection)
         
     Returns:
         Analysis result with scores and recommendations
     """
-    # Parse job description if it's JSON string
-    try:
-        if job_description.startswith('{') or job_description.startswith('['):
-            job_description = json.loads(job_description)
-            if isinstance(job_description, dict):
-                job_description = job_description.get('job_description', str(job_description))
-            elif isinstance(job_description, list):
-                job_description = ' '.join(job_description)
-    except json.JSONDecodeError:
-        pass
+    job_description = _parse_job_description(job_description)
+    content = await _read_resume_pdf(file)
     
-    # Validate file
-    if not file.filename:
-        from fastapi import HTTPException
-        raise HTTPException(status_code=400, detail="No file provided")
+    # Extract text from the in-memory upload and analyze (identical re-submissions are served from cache)
+    return await resume_service.compare_resume(content, job_description, current_user["uid"], max_pages)
+
+
+@router.post("/compare-resume-jd/stream")
+async def stream_compare_resume_jd(
+    file: UploadFile = File(...),
+    job_description: str = Form(...),
+    max_pages: int = Query(
+        settings.resume_analysis_max_pages,
+        ge=1,
+        le=settings.resume_max_pages,
+        description="Number of leading resume pages to analyze"
+    ),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Compare resume with job description and stream the analysis as server-sent events.
     
-    file_extension = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
-    if file_extension != 'pdf':
-        from fastapi import HTTPException
+    Each event carries a `text` chunk; the final event has `done` plus the
+    same fields as `/resume/compare-resume-jd` (or `error` if generation failed).
+    """
+    job_description = _parse_job_description(job_description)
+    content = await _read_resume_pdf(file)
+    events = await resume_service.stream_compare_resume(content, job_description, current_user["uid"], max_pages)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
+@router.post("/compare-resumes-jd-batch")
+async def compare_resumes_jd_batch(
+    files: list[UploadFile] = File(...),
+    job_description: str = Form(...),
+    max_pages: int = Query(
+        settings.resume_analysis_max_pages,
+        ge=1,
+        le=settings.resume_max_pages,
+        description="Number of leading resume pages to analyze"
+    ),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Compare several resumes with one job description in a single analysis.
+    
+    Args:
+        files: Resume PDF files
+        job_description: Job description text
+        max_pages: Number of leading pages to analyze per resume
+        current_user: Current user data from token (dependency injection)
+        
+    Returns:
+        Job description plus one result (filename, analysis, resume_text) per resume, in upload order
+    """
+    if len(files) > settings.resume_batch_max_files:
         raise HTTPException(
             status_code=400,
-            detail="Only PDF files are supported for resume analysis"
+            detail=f"Too many resumes. Max per batch: {settings.resume_batch_max_files}"
         )
     
-    # Save file temporarily
-    os.makedirs(resume_service.temp_dir, exist_ok=True)
-    file_location = f"{resume_service.temp_dir}/{file.filename}"
-    
-    try:
-        content = await file.read()
-        if not content:
-            from fastapi import HTTPException
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
-        
-        with open(file_location, "wb") as f:
-            f.write(content)
-        
-        # Extract text and analyze
-        user_id = current_user["uid"]
-        resume_text = resume_service.extract_resume_text(file_location)
-        result = resume_service.analyze_resume(resume_text, job_description, user_id)
-        
-        return result
-    finally:
-        # Clean up temporary file
-        if os.path.exists(file_location):
-            os.remove(file_location)
+    job_description = _parse_job_description(job_description)
+    resumes = [(file.filename, await _read_resume_pdf(file)) for file in files]
+    return await resume_service.compare_resumes(resumes, job_description, current_user["uid"], max_pages)
 
 
 @router.post("/generate-resume")
-@handle_exceptions
 async def generate_resume(
     req: GenerateResumeRequest,
     current_user: dict = Depends(get_current_user)
@@ -95,16 +160,35 @@ async def generate_resume(
     Returns:
         Generated resume JSON structure
     """
-    return resume_service.generate_resume(
+    return await resume_service.generate_resume(
+        resume_type=req.resume_type,
+        resume_text=req.resume_text,
+        user_id=current_user["uid"],
+        job_description=req.job_description
+    )
+
+
+@router.post("/generate-resume/stream")
+async def stream_generate_resume(
+    req: GenerateResumeRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate/formatted resume JSON, streaming the model output as server-sent events.
+    
+    Each event carries a raw `text` chunk; the final event has `done` plus the
+    parsed resume under `resume` (or `error` if generation failed).
+    """
+    events = await resume_service.stream_generate_resume(
         resume_type=req.resume_type,
         resume_text=req.resume_text,
         user_id=current_user["uid"],
         job_description=req.job_description
     )
+    return StreamingResponse(events, media_type="text/event-stream")
 
 
 @router.post("/generate-pdf")
-@handle_exceptions
 async def generate_pdf(
     req: GeneratePDFRequest,
     current_user: dict = Depends(get_current_user)
@@ -129,7 +213,6 @@ async def generate_pdf(
 
 
 @router.post("/download")
-@handle_exceptions
 async def download_resume(
     req: GeneratePDFRequest,
     format: str = Query("pdf", description="Download format: 'pdf' or 'json'"),
@@ -148,10 +231,10 @@ async def download_resume(
     """
     if format.lower() == "json":
         # Download as JSON
-        json_str = json.dumps(req.resume_data, indent=2, ensure_ascii=False)
+        json_bytes = orjson.dumps(req.resume_data, option=orjson.OPT_INDENT_2)
         filename = f"resume_{current_user['uid'][:8]}.json"
         return Response(
-            content=json_str.encode('utf-8'),
+            content=json_bytes,
             media_type="application/json",
             headers={
                 "Content-Disposition": f'attachment; filename="{filename}"'
@@ -166,7 +249,6 @@ async def download_resume(
         filename = f"resume_{req.template_id}_{current_user['uid'][:8]}.pdf"
         return pdf_service.create_pdf_response(pdf_bytes, filename)
     else:
-        from fastapi import HTTPException
         raise HTTPException(
             status_code=400,
             detail="Invalid format. Must be 'pdf' or 'json'"
@@ -2,13 +2,12 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from app.dependencies import get_current_user
 from app.services.usage_limit_service import usage_limit_service
-from app.decorators import handle_exceptions
+from app.api.routing import ErrorHandlingRoute
 
-router = APIRouter(prefix="/usage", tags=["Usage & Admin"])
+router = APIRouter(prefix="/usage", tags=["Usage & Admin"], route_class=ErrorHandlingRoute)
 
 
 @router.get("/my-usage")
-@handle_exceptions
 async def get_my_usage(current_user: dict = Depends(get_current_user)):
     """
     Get current user's usage statistics and limits.
@@ -18,7 +17,6 @@ async def get_my_usage(current_user: dict = Depends(get_current_user)):
 
 
 @router.get("/user-usage/{target_user_id}")
-@handle_exceptions
 async def get_user_usage(
     target_user_id: str, 
     current_user: dict = Depends(get_current_user)
@@ -34,7 +32,6 @@ async def get_user_usage(
 
 
 @router.post("/reset/{target_user_id}")
-@handle_exceptions
 async def reset_user_usage(
     target_user_id: str,
     current_user: dict = Depends(get_current_user)
@@ -47,7 +44,6 @@ async def reset_user_usage(
 
 
 @router.get("/all-users")
-@handle_exceptions
 async def list_all_users_usage(
     limit: int = Query(100, ge=1, le=1000),
     current_user: dict = Depends(get_current_user)
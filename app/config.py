@@ -1,12 +1,17 @@
-from pydantic_settings import BaseSettings
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
     
+    # Read once at startup and shared by every request; never mutated afterwards
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, frozen=True)
+    
     # Firebase Configuration
     firebase_api_key: str = ""
+    firebase_project_id: str = ""  # Falls back to project_id in the service account JSON
     google_application_credentials_json: Optional[str] = None
     
     # Gemini AI Configuration
@@ -18,30 +23,56 @@ class Settings(BaseSettings):
     debug: bool = False
     
     # CORS Configuration
-    cors_origins: list[str] = [
+    cors_origins: tuple[str, ...] = (
         "http://localhost:3000",
         "http://localhost:5173",
         "http://127.0.0.1:3000",
         "http://127.0.0.1:5173",
         "https://smartchataiapp.vercel.app",
-    ]
+    )
     
     # File Upload Configuration
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
+    max_request_body_size: int = 110 * 1024 * 1024  # Whole request; fits a full batch of resumes plus form fields
     temp_docs_dir: str = "temp_docs"
-    temp_resumes_dir: str = "temp_resumes"
+    resume_max_pages: int = 200  # Resume PDFs with more pages are rejected before text extraction
+    resume_batch_max_files: int = 10  # Resumes analyzed together in one batch request
+    resume_analysis_max_pages: int = 3  # Default leading pages read for resume/JD comparison
+    # Output token caps for resume Gemini calls; on 2.5 models these include thinking tokens
+    resume_analysis_max_output_tokens: int = 4096
+    resume_generation_max_output_tokens: int = 8192
     vectorstores_dir: str = "vectorstores"  # Directory for persistent FAISS vectorstores
+    vectorstore_cache_size: int = 128  # Vectorstores kept in memory per worker
+    vectorstore_cache_ttl: int = 3600  # Seconds a vectorstore stays in the in-memory cache
+    resume_analysis_cache_size: int = 1024  # Resume/JD analyses memoized by content hash
+    resume_analysis_cache_ttl: int = 3600  # Seconds a resume analysis stays cached
+    resume_text_cache_size: int = 512  # Extracted resume texts memoized by PDF hash (same TTL)
+    resume_generation_cache_size: int = 512  # Generated resumes memoized by prompt hash
+    resume_generation_cache_ttl: int = 900  # Seconds a generated resume stays cached
+    resume_prompt_max_chars: int = 8000  # Resume text beyond this is clipped from the middle in prompts
+    job_description_prompt_max_chars: int = 4000  # Same for job descriptions
     
     # Gemini Model Configuration
     gemini_model: str = "gemini-2.5-flash"
     gemini_api_url: str = "https://generativelanguage.googleapis.com/v1beta/models"
+    gemini_resume_polish_model: str = "gemini-2.5-flash-lite"  # Resume cleanup without a JD (no new content)
+    gemini_fallback_model: str = "gemini-2.5-flash-lite"  # Retried once when a resume call times out ("" disables)
+    gemini_max_retries: int = 2  # Retries for rate-limited/transient Gemini generateContent failures
+    gemini_embedding_dimensions: int = 768  # gemini-embedding-001 supports 768, 1536 or 3072
+    embedding_cache_size: int = 20_000  # Chunk embeddings memoized by content hash
+    embedding_concurrency: int = 4  # Concurrent batchEmbedContents requests per process
+    embedding_fallback_concurrency: int = 16  # Concurrent per-text embedContent requests when a batch fails
+    redis_url: str = ""  # e.g. redis://localhost:6379/0; shares embeddings across workers ("" disables)
+    embedding_redis_ttl: int = 7 * 24 * 3600  # Seconds an embedding stays in Redis
     
     # Encryption Configuration
     encryption_key: Optional[str] = None  # Fernet key for encrypting user API keys
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the application settings, validated once per process."""
+    return Settings()
+
+
+settings = get_settings()
@@ -0,0 +1,135 @@
+"""Document loading and chunking, run in worker processes to keep parsing off the GIL."""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import fitz  # PyMuPDF
+from langchain_community.document_loaders import (
+    PyMuPDFLoader,
+    TextLoader,
+    Docx2txtLoader,
+    UnstructuredPowerPointLoader,
+    UnstructuredExcelLoader
+)
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+
+# Token estimate used for chunk sizing: 1 token ≈ 4 chars
+CHARS_PER_TOKEN = 4
+
+SUPPORTED_EXTENSIONS = {
+    # One Document per page, extracted by MuPDF in C
+    '.pdf': PyMuPDFLoader,
+    '.txt': TextLoader,
+    '.docx': Docx2txtLoader,
+    '.doc': Docx2txtLoader,
+    '.ppt': UnstructuredPowerPointLoader,
+    '.pptx': UnstructuredPowerPointLoader,
+    '.xls': UnstructuredExcelLoader,
+    '.xlsx': UnstructuredExcelLoader
+}
+SUPPORTED_EXTENSION_SET = frozenset(SUPPORTED_EXTENSIONS)
+UNSUPPORTED_TYPE_MESSAGE = f"Unsupported file type. Supported types are: {', '.join(SUPPORTED_EXTENSIONS)}"
+
+
+def get_chunk_size(doc_length: int) -> tuple[int, int]:
+    """Adaptive chunking based on document size."""
+    if doc_length < 5000:
+        return 500, 100
+    elif doc_length < 50000:
+        return 1000, 200
+    else:
+        return 1500, 300
+
+
+def count_tokens(text: str) -> int:
+    """Estimate token count (rough approximation: 1 token ≈ 4 chars)."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def load_and_split(file_path: str) -> tuple[list[Document], int, int, int]:
+    """
+    Load a document and split it into chunks.
+
+    Top-level and picklable so it can run in the loading process pool.
+
+    Args:
+        file_path: Path to document file
+
+    Returns:
+        Tuple of (chunks, total token estimate, chunk size, chunk overlap)
+
+    Raises:
+        ValueError: If the file type is unsupported or nothing could be extracted
+    """
+    # Uploads are validated by the route; this only guards direct callers
+    loader_cls = SUPPORTED_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+    if loader_cls is None:
+        raise ValueError(UNSUPPORTED_TYPE_MESSAGE)
+
+    documents = loader_cls(file_path).load()
+    if not documents:
+        raise ValueError("No content could be extracted from the document")
+
+    # Adaptive chunking based on token count
+    total_length = sum(count_tokens(doc.page_content) for doc in documents)
+    chunk_size, chunk_overlap = get_chunk_size(total_length)
+
+    # For very small documents, don't chunk - just use as-is
+    if total_length < 100:
+        return documents, total_length, chunk_size, chunk_overlap
+
+    # Ensure chunk_size is smaller than document
+    chunk_size = min(chunk_size, max(100, total_length - 50))
+    chunk_overlap = min(chunk_overlap, chunk_size // 4)
+
+    # The splitter measures every candidate piece; sizing in characters lets it use the
+    # builtin len instead of calling back into a Python token estimator each time
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size * CHARS_PER_TOKEN,
+        chunk_overlap=chunk_overlap * CHARS_PER_TOKEN,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return splitter.split_documents(documents), total_length, chunk_size, chunk_overlap
+
+
+def extract_pdf_text(content: bytes, start: int, stop: int) -> str:
+    """
+    Extract the text of pages [start, stop) of a PDF, one newline after each page.
+
+    Top-level and picklable so page ranges of long PDFs can be extracted in the
+    loading process pool.
+
+    Args:
+        content: PDF file bytes
+        start: First page index
+        stop: Page index to stop before
+
+    Returns:
+        Extracted text
+    """
+    with fitz.open(stream=content, filetype="pdf") as pdf:
+        return "".join(pdf[i].get_text("text") + "\n" for i in range(start, stop))
+
+
+@lru_cache(maxsize=1)
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Get the shared document loading process pool, created on first use.
+
+    Workers are spawned rather than forked so they don't inherit the parent's
+    gRPC/Firestore threads; they only import this module.
+    """
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def shutdown_process_pool() -> None:
+    """Shut down the loading process pool if it was started."""
+    if get_process_pool.cache_info().currsize:
+        get_process_pool().shutdown(cancel_futures=True)
+        get_process_pool.cache_clear()
@@ -1,8 +1,133 @@
 """Gemini Embeddings using Google's Gemini API (lightweight, no model download)."""
+import asyncio
+import hashlib
+import threading
+import httpx
+import numpy as np
+import orjson
+import redis
+import redis.asyncio
 import requests
+from cachetools import LRUCache
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from langchain_core.embeddings import Embeddings
 from app.config import settings
+from app.core.http_client import http_client
+
+
+# Maximum number of requests accepted by batchEmbedContents
+EMBED_BATCH_SIZE = 100
+
+# Queries arriving within this window share one batchEmbedContents call
+QUERY_BATCH_WINDOW = 0.005
+
+# Pooled keep-alive session shared by sync embedding calls (runs in worker threads);
+# the async methods multiplex over the shared HTTP/2 client instead
+_session = requests.Session()
+# Embedding requests are idempotent, so rate limits and transient 5xx are retried on the warm connection
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False
+    )
+))
+
+# Batch requests of one large document are sent concurrently
+_batch_executor = ThreadPoolExecutor(
+    max_workers=settings.embedding_concurrency,
+    thread_name_prefix="gemini-embed"
+)
+
+# Per-text fallback requests when a batch fails; separate from _batch_executor, whose
+# workers submit here and would deadlock waiting on their own pool
+_text_executor = ThreadPoolExecutor(
+    max_workers=settings.embedding_fallback_concurrency,
+    thread_name_prefix="gemini-embed-text"
+)
+
+# Chunk embeddings keyed by (model, dimensions, content hash); re-uploaded boilerplate skips the API
+_embedding_cache: LRUCache = LRUCache(maxsize=settings.embedding_cache_size)
+_embedding_cache_lock = threading.Lock()
+
+# Optional second tier shared by all workers and restarts: raw float16 vectors under the same key
+_redis = redis.Redis.from_url(settings.redis_url) if settings.redis_url else None
+_async_redis = redis.asyncio.Redis.from_url(settings.redis_url) if settings.redis_url else None
+
+
+def _redis_key(key: tuple) -> bytes:
+    """Build the Redis key for an embedding cache key."""
+    model, dimensions, digest = key
+    return b"emb:%s:%d:" % (model.encode(), dimensions) + digest
+
+
+def _take_shared(missing: dict, raw_vectors: list) -> dict:
+    """
+    Decode vectors found in Redis and drop them from the missing texts.
+    
+    Args:
+        missing: {cache key: text} still to embed (updated in place)
+        raw_vectors: Redis values for the keys of missing, in order (None on miss)
+        
+    Returns:
+        {cache key: vector} found in Redis
+    """
+    found = {
+        key: np.frombuffer(raw, dtype=np.float16).copy()
+        for key, raw in zip(list(missing), raw_vectors)
+        if raw is not None
+    }
+    for key in found:
+        del missing[key]
+    return found
+
+
+def _shared_get(keys: list) -> list:
+    """Get raw vectors from Redis; a Redis outage counts as a miss."""
+    try:
+        return _redis.mget([_redis_key(key) for key in keys])
+    except redis.RedisError as e:
+        print(f"[Warning] Redis embedding cache unavailable: {e}")
+        return [None] * len(keys)
+
+
+async def _async_shared_get(keys: list) -> list:
+    """Async _shared_get."""
+    try:
+        return await _async_redis.mget([_redis_key(key) for key in keys])
+    except redis.RedisError as e:
+        print(f"[Warning] Redis embedding cache unavailable: {e}")
+        return [None] * len(keys)
+
+
+def _shared_set(vectors: dict) -> None:
+    """Put vectors in Redis, best effort."""
+    try:
+        with _redis.pipeline(transaction=False) as pipe:
+            for key, vector in vectors.items():
+                pipe.setex(_redis_key(key), settings.embedding_redis_ttl, vector.tobytes())
+            pipe.execute()
+    except redis.RedisError as e:
+        print(f"[Warning] Redis embedding cache unavailable: {e}")
+
+
+async def _async_shared_set(vectors: dict) -> None:
+    """Async _shared_set."""
+    try:
+        async with _async_redis.pipeline(transaction=False) as pipe:
+            for key, vector in vectors.items():
+                pipe.setex(_redis_key(key), settings.embedding_redis_ttl, vector.tobytes())
+            await pipe.execute()
+    except redis.RedisError as e:
+        print(f"[Warning] Redis embedding cache unavailable: {e}")
 
 
 class GeminiEmbeddings(Embeddings):
@@ -21,12 +146,27 @@ class GeminiEmbeddings(Embeddings):
         """
         self.api_key = api_key or settings.gemini_api_key
         self.embedding_model = "gemini-embedding-001"
+        # Truncated (Matryoshka) embeddings: smaller vectors, faster search, same API cost
+        self.output_dimensionality = settings.gemini_embedding_dimensions
         self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.embedding_model}:embedContent"
         self.batch_api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.embedding_model}:batchEmbedContents"
+        # Parsed once; httpx skips URL parsing for URL instances
+        self.async_api_url = httpx.URL(self.api_url)
+        self.async_batch_api_url = httpx.URL(self.batch_api_url)
         
         if not self.api_key:
             raise ValueError("Gemini API key is not set. Set GEMINI_API_KEY in environment variables.")
         
+        self.headers = {
+            "x-goog-api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
+        
+        # Concurrent async query embeddings waiting for the current batch window (event loop only)
+        self._pending_queries: list[tuple[str, asyncio.Future]] = []
+        # Running flushes, referenced so they aren't garbage collected mid-request
+        self._flush_tasks: set[asyncio.Task] = set()
+        
         print(f"Using Gemini API for embeddings ({self.embedding_model})")
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
@@ -37,11 +177,96 @@ class GeminiEmbeddings(Embeddings):
             texts: List of text strings to embed
             
         Returns:
-            List of embedding vectors
+            List of embedding vectors (float16 arrays)
+        """
+        keys, vectors, missing = self._lookup(texts)
+        if missing and _redis is not None:
+            vectors = self._store(keys, vectors, _take_shared(missing, _shared_get(list(missing))))
+        if missing:
+            batches = self._batches(list(missing.values()))
+            if len(batches) == 1:
+                results = [self._embed_batch(batches[0])]
+            else:
+                results = list(_batch_executor.map(self._embed_batch, batches))
+            fetched = self._to_vectors(list(missing), results)
+            vectors = self._store(keys, vectors, fetched)
+            if _redis is not None:
+                _shared_set(fetched)
+        
+        return vectors
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents without blocking the event loop.
+        
+        Batch requests are multiplexed over the shared HTTP/2 client.
+        
+        Args:
+            texts: List of text strings to embed
+            
+        Returns:
+            List of embedding vectors (float16 arrays)
+        """
+        keys, vectors, missing = self._lookup(texts)
+        if missing and _async_redis is not None:
+            vectors = self._store(keys, vectors, _take_shared(missing, await _async_shared_get(list(missing))))
+        if missing:
+            semaphore = asyncio.Semaphore(settings.embedding_concurrency)
+            
+            async def embed(batch: List[str]) -> List[List[float]]:
+                async with semaphore:
+                    return await self._aembed_batch(batch)
+            
+            results = await asyncio.gather(*(embed(batch) for batch in self._batches(list(missing.values()))))
+            fetched = self._to_vectors(list(missing), results)
+            vectors = self._store(keys, vectors, fetched)
+            if _async_redis is not None:
+                await _async_shared_set(fetched)
+        
+        return vectors
+    
+    def _lookup(self, texts: List[str]) -> tuple[list, list, dict]:
+        """
+        Look texts up in the embedding cache.
+        
+        Returns:
+            Tuple of (cache keys, cached vectors or None, {key: text} of distinct misses)
         """
-        # Use sequential API calls (more reliable than batch API)
-        # Can be optimized later if batch API format is confirmed
-        return [self._embed_text(text) for text in texts]
+        keys = [self._cache_key(text) for text in texts]
+        with _embedding_cache_lock:
+            vectors = [_embedding_cache.get(key) for key in keys]
+        # Only texts not seen before are sent, each distinct text once
+        missing = {key: text for key, text, vector in zip(keys, texts, vectors) if vector is None}
+        return keys, vectors, missing
+    
+    @staticmethod
+    def _batches(texts: List[str]) -> List[List[str]]:
+        """Split texts into batchEmbedContents-sized batches."""
+        # One batchEmbedContents call per 100 texts instead of one call per text
+        return [texts[start:start + EMBED_BATCH_SIZE] for start in range(0, len(texts), EMBED_BATCH_SIZE)]
+    
+    @staticmethod
+    def _to_vectors(missing_keys: list, results: list) -> dict:
+        """Map batch results onto their cache keys."""
+        # Stored as float16: half the cache memory; callers upcast when building indexes
+        return {
+            key: np.asarray(values, dtype=np.float16)
+            for key, values in zip(missing_keys, (values for batch in results for values in batch))
+        }
+    
+    @staticmethod
+    def _store(keys: list, vectors: list, fetched: dict) -> list:
+        """Cache fetched vectors and fill them into the looked-up vectors."""
+        if not fetched:
+            return vectors
+        with _embedding_cache_lock:
+            _embedding_cache.update(fetched)
+        return [fetched.get(key) if vector is None else vector for key, vector in zip(keys, vectors)]
+    
+    def _cache_key(self, text: str) -> tuple:
+        """Build the embedding cache key for a text."""
+        digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        return self.embedding_model, self.output_dimensionality, digest
     
     def embed_query(self, text: str) -> List[float]:
         """
@@ -53,7 +278,132 @@ class GeminiEmbeddings(Embeddings):
         Returns:
             Embedding vector
         """
-        return self._embed_text(text)
+        key = self._cache_key(text)
+        with _embedding_cache_lock:
+            vector = _embedding_cache.get(key)
+        if vector is not None:
+            return vector
+        
+        if _redis is not None:
+            found = _take_shared({key: text}, _shared_get([key]))
+            if found:
+                return self._store([key], [None], found)[0]
+        
+        vector = np.asarray(self._embed_text(text), dtype=np.float16)
+        with _embedding_cache_lock:
+            _embedding_cache[key] = vector
+        if _redis is not None:
+            _shared_set({key: vector})
+        return vector
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed a single query text without blocking the event loop.
+        
+        Args:
+            text: Query text to embed
+            
+        Returns:
+            Embedding vector
+        """
+        key = self._cache_key(text)
+        with _embedding_cache_lock:
+            vector = _embedding_cache.get(key)
+        if vector is not None:
+            return vector
+        
+        if _async_redis is not None:
+            found = _take_shared({key: text}, await _async_shared_get([key]))
+            if found:
+                return self._store([key], [None], found)[0]
+        
+        # The first query in a window schedules a flush that embeds every query
+        # queued meanwhile in one batch request. The flush runs as its own task, so a
+        # cancelled request can't strand the queries queued behind it.
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_queries.append((text, future))
+        if len(self._pending_queries) == 1:
+            loop.call_later(QUERY_BATCH_WINDOW, self._flush_pending_queries)
+        
+        vector = np.asarray(await asyncio.shield(future), dtype=np.float16)
+        with _embedding_cache_lock:
+            _embedding_cache[key] = vector
+        if _async_redis is not None:
+            await _async_shared_set({key: vector})
+        return vector
+    
+    def _flush_pending_queries(self) -> None:
+        """Embed the queries queued during the batch window in a background task."""
+        pending, self._pending_queries = self._pending_queries, []
+        task = asyncio.ensure_future(self._aembed_pending_queries(pending))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _aembed_pending_queries(self, pending: list[tuple[str, asyncio.Future]]) -> None:
+        """Embed queued queries and resolve their futures."""
+        try:
+            if len(pending) == 1:
+                vectors = [await self._aembed_text(pending[0][0])]
+            else:
+                vectors = []
+                for start in range(0, len(pending), EMBED_BATCH_SIZE):
+                    batch = pending[start:start + EMBED_BATCH_SIZE]
+                    vectors.extend(await self._aembed_batch([text for text, _ in batch]))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        
+        for (_, future), vector in zip(pending, vectors):
+            future.set_result(vector)
+    
+    def _batch_request_body(self, texts: List[str]) -> bytes:
+        """Encode a batchEmbedContents request."""
+        return orjson.dumps({
+            "requests": [
+                {
+                    "model": f"models/{self.embedding_model}",
+                    "content": {"parts": [{"text": text}]},
+                    "outputDimensionality": self.output_dimensionality
+                }
+                for text in texts
+            ]
+        })
+    
+    def _parse_batch_response(self, response, count: int) -> List[List[float]]:
+        """
+        Extract embeddings from a batchEmbedContents response (requests or httpx).
+        
+        Raises:
+            ValueError: If the model is missing or the response is malformed
+        """
+        if response.status_code == 404:
+            raise ValueError(
+                f"Embedding model not found. Response: {response.text}"
+            )
+        
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        
+        # Response format: {"embeddings": [{"embedding": {"values": [...]}}, ...]}
+        if "embeddings" not in result:
+            raise ValueError(f"Unexpected batch API response format: {result}")
+        
+        if len(result["embeddings"]) != count:
+            raise ValueError(
+                f"Batch API returned {len(result['embeddings'])} embeddings for {count} texts"
+            )
+        
+        embeddings_list = []
+        for emb in result["embeddings"]:
+            if "embedding" not in emb:
+                raise ValueError(f"Missing 'embedding' key in response: {emb}. Full response: {result}")
+            if "values" not in emb["embedding"]:
+                raise ValueError(f"Missing 'values' key in embedding: {emb['embedding']}. Full response: {result}")
+            embeddings_list.append(emb["embedding"]["values"])
+        
+        return embeddings_list
     
     def _embed_batch(self, texts: List[str]) -> List[List[float]]:
         """
@@ -66,63 +416,93 @@ class GeminiEmbeddings(Embeddings):
             List of embedding vectors
         """
         try:
-            headers = {
-                "x-goog-api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
-            # Batch embedding request format
-            json_body = {
-                "requests": [
-                    {
-                        "model": f"models/{self.embedding_model}",
-                        "content": {"parts": [{"text": text}]}
-                    }
-                    for text in texts
-                ]
-            }
-            
-            response = requests.post(
+            response = _session.post(
                 self.batch_api_url,
-                headers=headers,
-                json=json_body,
+                headers=self.headers,
+                data=self._batch_request_body(texts),
                 timeout=60
             )
-            
-            if response.status_code == 404:
-                raise ValueError(
-                    f"Embedding model not found. Response: {response.text}"
-                )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract embeddings from batch response
-            # Response format: {"embeddings": [{"embedding": {"values": [...]}}, ...]}
-            if "embeddings" not in result:
-                raise ValueError(f"Unexpected batch API response format: {result}")
-            
-            embeddings_list = []
-            for emb in result["embeddings"]:
-                if "embedding" not in emb:
-                    raise ValueError(f"Missing 'embedding' key in response: {emb}. Full response: {result}")
-                if "values" not in emb["embedding"]:
-                    raise ValueError(f"Missing 'values' key in embedding: {emb['embedding']}. Full response: {result}")
-                embeddings_list.append(emb["embedding"]["values"])
-            
-            return embeddings_list
+            return self._parse_batch_response(response, len(texts))
         except (KeyError, ValueError) as e:
             # If it's a parsing error, fallback to sequential
             error_msg = str(e)
             print(f"Batch embedding parsing failed, falling back to sequential: {error_msg}")
-            return [self._embed_text(text) for text in texts]
+            return list(_text_executor.map(self._embed_text, texts))
         except requests.exceptions.RequestException as e:
             # Fallback to sequential if batch fails
             error_detail = str(e)
             if hasattr(e, 'response') and e.response is not None:
                 error_detail += f" - Response: {e.response.text}"
             print(f"Batch embedding API call failed, falling back to sequential: {error_detail}")
-            return [self._embed_text(text) for text in texts]
+            return list(_text_executor.map(self._embed_text, texts))
+    
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts using batch API over the shared async client.
+        
+        Args:
+            texts: List of text strings to embed (max 100)
+            
+        Returns:
+            List of embedding vectors
+        """
+        try:
+            response = await http_client.post(
+                self.async_batch_api_url,
+                headers=self.headers,
+                content=self._batch_request_body(texts),
+                timeout=60
+            )
+            return self._parse_batch_response(response, len(texts))
+        except (KeyError, ValueError) as e:
+            print(f"Batch embedding parsing failed, falling back to per-text requests: {e}")
+        except httpx.HTTPError as e:
+            error_detail = str(e)
+            if isinstance(e, httpx.HTTPStatusError):
+                error_detail += f" - Response: {e.response.text}"
+            print(f"Batch embedding API call failed, falling back to per-text requests: {error_detail}")
+        # Single-text requests share the HTTP/2 connection, so send them concurrently
+        return list(await asyncio.gather(*(self._aembed_text(text) for text in texts)))
+    
+    def _text_request_body(self, text: str) -> bytes:
+        """Encode an embedContent request."""
+        return orjson.dumps({
+            "content": {"parts": [{"text": text}]},
+            "outputDimensionality": self.output_dimensionality
+        })
+    
+    def _parse_text_response(self, response) -> List[float]:
+        """
+        Extract the embedding from an embedContent response (requests or httpx).
+        
+        Raises:
+            ValueError: If the model is missing or the response is malformed
+        """
+        if response.status_code == 404:
+            raise ValueError(
+                f"Embedding model not found. Check if '{self.embedding_model}' is available. "
+                f"Response: {response.text}"
+            )
+        
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        
+        # Check response structure and provide detailed error
+        if "embedding" not in result:
+            raise ValueError(
+                f"Missing 'embedding' key in API response. "
+                f"Response keys: {list(result.keys())}. "
+                f"Full response: {result}"
+            )
+        
+        if "values" not in result["embedding"]:
+            raise ValueError(
+                f"Missing 'values' key in embedding. "
+                f"Embedding keys: {list(result['embedding'].keys())}. "
+                f"Full response: {result}"
+            )
+        
+        return result["embedding"]["values"]
     
     def _embed_text(self, text: str) -> List[float]:
         """
@@ -138,49 +518,56 @@ class GeminiEmbeddings(Embeddings):
             raise ValueError("Gemini API key is not set")
         
         try:
-            headers = {
-                "x-goog-api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
-            json_body = {
-                "content": {"parts": [{"text": text}]}
-            }
-            
-            response = requests.post(
+            response = _session.post(
                 self.api_url,
-                headers=headers,
-                json=json_body,
+                headers=self.headers,
+                data=self._text_request_body(text),
                 timeout=30
             )
-            
-            if response.status_code == 404:
-                raise ValueError(
-                    f"Embedding model not found. Check if '{self.embedding_model}' is available. "
-                    f"Response: {response.text}"
-                )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            # Check response structure and provide detailed error
-            if "embedding" not in result:
-                raise ValueError(
-                    f"Missing 'embedding' key in API response. "
-                    f"Response keys: {list(result.keys())}. "
-                    f"Full response: {result}"
-                )
-            
-            if "values" not in result["embedding"]:
-                raise ValueError(
-                    f"Missing 'values' key in embedding. "
-                    f"Embedding keys: {list(result['embedding'].keys())}. "
-                    f"Full response: {result}"
-                )
-            
-            return result["embedding"]["values"]
+            return self._parse_text_response(response)
         except requests.exceptions.RequestException as e:
             error_detail = str(e)
             if hasattr(e, 'response') and e.response is not None:
                 error_detail += f" - Response: {e.response.text}"
             raise ValueError(f"Failed to get embedding from Gemini API: {error_detail}")
+    
+    async def _aembed_text(self, text: str) -> List[float]:
+        """
+        Embed a single text using Gemini API over the shared async client.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector as list of floats
+        """
+        if not self.api_key:
+            raise ValueError("Gemini API key is not set")
+        
+        try:
+            response = await http_client.post(
+                self.async_api_url,
+                headers=self.headers,
+                content=self._text_request_body(text),
+                timeout=30
+            )
+            return self._parse_text_response(response)
+        except httpx.HTTPError as e:
+            error_detail = str(e)
+            if isinstance(e, httpx.HTTPStatusError):
+                error_detail += f" - Response: {e.response.text}"
+            raise ValueError(f"Failed to get embedding from Gemini API: {error_detail}")
+
+
+@lru_cache(maxsize=256)
+def get_gemini_embeddings(api_key: Optional[str] = None) -> GeminiEmbeddings:
+    """
+    Get the shared GeminiEmbeddings instance for an API key.
+    
+    Args:
+        api_key: Gemini API key (uses settings key if not provided)
+        
+    Returns:
+        Cached GeminiEmbeddings instance
+    """
+    return GeminiEmbeddings(api_key=api_key)
@@ -0,0 +1,17 @@
+"""Shared async HTTP client for outbound API calls."""
+import httpx
+
+
+# One pooled client per process so Firebase/Gemini connections are reused across requests.
+# httpx drops idle connections after 5s by default, which on a quiet server means a fresh
+# TLS handshake to Gemini for most requests; keep them for a minute instead.
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=10,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=60),
+)
+
+
+async def close_http_client() -> None:
+    """Close pooled connections on application shutdown."""
+    await http_client.aclose()
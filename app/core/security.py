@@ -1,12 +1,112 @@
 """Security utilities for authentication and authorization."""
 import base64
+import hashlib
+import json
 import os
+import re
+import threading
+import time
+from functools import lru_cache
+import requests
+from cachetools import TTLCache
 from fastapi import HTTPException, Request
-from firebase_admin import auth
+from jose import jwt
+from jose.exceptions import JWTError, ExpiredSignatureError
 from cryptography.fernet import Fernet
 from app.config import settings
 
 
+# Google's public x509 certificates used to sign Firebase ID tokens
+FIREBASE_CERTS_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+)
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+DEFAULT_CERTS_MAX_AGE = 3600
+
+# Certificates keyed by "kid", refreshed when the Cache-Control max-age expires
+_public_keys: dict[str, str] = {}
+_public_keys_expires_at: float = 0.0
+_public_keys_lock = threading.Lock()
+
+# Verified token claims keyed by token hash; hits are also checked against the token's exp
+_verified_tokens: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+_verified_tokens_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _get_firebase_project_id() -> str:
+    """
+    Resolve the Firebase project ID used as token audience.
+    
+    Returns:
+        Project ID from settings, or from the service account JSON
+        
+    Raises:
+        HTTPException: If no project ID can be determined
+    """
+    if settings.firebase_project_id:
+        return settings.firebase_project_id
+    
+    if settings.google_application_credentials_json:
+        try:
+            project_id = json.loads(settings.google_application_credentials_json).get("project_id")
+        except json.JSONDecodeError:
+            project_id = None
+        if project_id:
+            return project_id
+    
+    raise HTTPException(
+        status_code=500,
+        detail="Firebase project ID not configured"
+    )
+
+
+def _get_firebase_public_keys(force_refresh: bool = False) -> dict[str, str]:
+    """
+    Get Firebase token signing certificates, fetching them when the cache is stale.
+    
+    Args:
+        force_refresh: Refetch even if the cached certificates have not expired
+        
+    Returns:
+        Dictionary mapping key ID to PEM encoded certificate
+        
+    Raises:
+        HTTPException: If the certificates cannot be fetched
+    """
+    global _public_keys, _public_keys_expires_at
+    
+    if not force_refresh and _public_keys and time.time() < _public_keys_expires_at:
+        return _public_keys
+    
+    with _public_keys_lock:
+        # Another thread may have refreshed while we waited for the lock
+        if not force_refresh and _public_keys and time.time() < _public_keys_expires_at:
+            return _public_keys
+        
+        try:
+            response = requests.get(FIREBASE_CERTS_URL, timeout=10)
+            response.raise_for_status()
+            keys = response.json()
+        except Exception as e:
+            if _public_keys:
+                # Keep serving with the previous certificates rather than failing every request
+                return _public_keys
+            raise HTTPException(
+                status_code=503,
+                detail=f"Unable to fetch token signing keys: {str(e)}"
+            )
+        
+        max_age = DEFAULT_CERTS_MAX_AGE
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if match:
+            max_age = int(match.group(1))
+        
+        _public_keys = keys
+        _public_keys_expires_at = time.time() + max_age
+        return _public_keys
+
+
 def verify_firebase_token(request: Request) -> dict:
     """
     Verify Firebase ID token from Authorization header.
@@ -30,28 +130,80 @@ def verify_firebase_token(request: Request) -> dict:
     
     id_token = auth_header.split("Bearer ")[1]
     
-    try:
-        decoded_token = auth.verify_id_token(id_token)
-        return decoded_token
-    except Exception as e:
-        raise HTTPException(
-            status_code=401,
-            detail=f"Authentication failed: {str(e)}"
-        )
+    # Repeat requests with the same token skip signature verification until it expires
+    cache_key = hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+    with _verified_tokens_lock:
+        cached_token = _verified_tokens.get(cache_key)
+    if cached_token is not None and cached_token["exp"] > time.time():
+        return dict(cached_token)
+    
+    decoded_token = _verify_id_token(id_token)
+    with _verified_tokens_lock:
+        _verified_tokens[cache_key] = decoded_token
+    return dict(decoded_token)
 
 
-def get_current_user_uid(request: Request) -> str:
+def _verify_id_token(id_token: str) -> dict:
     """
-    Extract user UID from verified Firebase token.
+    Verify a Firebase ID token's signature and claims.
     
     Args:
-        request: FastAPI Request object
+        id_token: Raw JWT string
         
     Returns:
-        User UID string
+        Decoded token claims, including "uid"
+        
+    Raises:
+        HTTPException: If the token is invalid or expired
     """
-    decoded_token = verify_firebase_token(request)
-    return decoded_token["uid"]
+    try:
+        key_id = jwt.get_unverified_header(id_token).get("kid")
+    except JWTError as e:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Authentication failed: {str(e)}"
+        )
+    
+    public_key = _get_firebase_public_keys().get(key_id)
+    if public_key is None:
+        # Google may have rotated its signing keys since the last fetch
+        public_key = _get_firebase_public_keys(force_refresh=True).get(key_id)
+    if public_key is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Authentication failed: Unknown token signing key"
+        )
+    
+    project_id = _get_firebase_project_id()
+    try:
+        decoded_token = jwt.decode(
+            id_token,
+            public_key,
+            algorithms=["RS256"],
+            audience=project_id,
+            issuer=f"{FIREBASE_ISSUER_PREFIX}{project_id}",
+            options={"verify_at_hash": False}
+        )
+    except ExpiredSignatureError:
+        raise HTTPException(
+            status_code=401,
+            detail="Authentication failed: Token has expired"
+        )
+    except JWTError as e:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Authentication failed: {str(e)}"
+        )
+    
+    if not decoded_token.get("sub"):
+        raise HTTPException(
+            status_code=401,
+            detail="Authentication failed: Token has no subject"
+        )
+    
+    # Match the Admin SDK's decoded token shape so callers can keep using token["uid"]
+    decoded_token["uid"] = decoded_token["sub"]
+    return decoded_token
 
 
 def decrypt_password(encrypted_password: str) -> str:
@@ -0,0 +1,56 @@
+"""Gemini streamGenerateContent reading and server-sent event framing."""
+from typing import AsyncIterator, Union
+import httpx
+import orjson
+from app.core.http_client import http_client
+
+
+async def stream_gemini_text(
+    url: str,
+    headers: dict,
+    content: bytes,
+    timeout: Union[float, httpx.Timeout]
+) -> AsyncIterator[str]:
+    """
+    POST a streamGenerateContent request (alt=sse) and yield each chunk's text.
+    
+    Args:
+        url: Model streamGenerateContent endpoint
+        headers: Request headers (API key and content type)
+        content: Encoded request body
+        timeout: Request timeout
+        
+    Yields:
+        Response text chunks, as Gemini generates them
+        
+    Raises:
+        httpx.HTTPStatusError: If Gemini answers with an error status (body already read)
+        httpx.RequestError: If Gemini cannot be reached
+    """
+    async with http_client.stream(
+        "POST",
+        url,
+        params={"alt": "sse"},
+        headers=headers,
+        content=content,
+        timeout=timeout
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+        
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            try:
+                data = orjson.loads(line[5:])
+                text = data["candidates"][0]["content"]["parts"][0]["text"]
+            except (ValueError, KeyError, IndexError):
+                # Chunks without text (e.g. finish reason only) are skipped
+                continue
+            yield text
+
+
+def sse_event(payload: dict) -> bytes:
+    """Frame a JSON payload as one server-sent event."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
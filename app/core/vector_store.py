@@ -0,0 +1,196 @@
+"""Minimal FAISS vectorstore: a raw index plus parallel chunk text/metadata lists."""
+import os
+from typing import Optional
+import faiss
+import numpy as np
+import orjson
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+INDEX_FILENAME = "index.faiss"
+DOCSTORE_FILENAME = "docstore.json"
+
+
+class DocumentVectorStore:
+    """
+    Chunks of one document, searchable by cosine similarity.
+
+    Row i of the FAISS index is the chunk at texts[i] / metadatas[i]. Vectors are
+    L2-normalized, so L2 distance ranks chunks by cosine similarity.
+    """
+
+    def __init__(self, index: faiss.Index, texts: list[str], metadatas: list[dict], embeddings: Embeddings):
+        """
+        Initialize vectorstore.
+
+        Args:
+            index: FAISS index holding one normalized vector per chunk
+            texts: Chunk texts, in index order
+            metadatas: Chunk metadata, in index order
+            embeddings: Embeddings used for queries
+        """
+        self.index = index
+        self.texts = texts
+        self.metadatas = metadatas
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_vectors(
+        cls,
+        index: faiss.Index,
+        vectors: np.ndarray,
+        documents: list[Document],
+        embeddings: Embeddings
+    ) -> "DocumentVectorStore":
+        """
+        Add precomputed chunk vectors to a trained, empty index.
+
+        Args:
+            index: Trained, empty FAISS index
+            vectors: L2-normalized float32 matrix, one row per document
+            documents: Chunks matching the vector rows
+            embeddings: Embeddings used for queries
+
+        Returns:
+            DocumentVectorStore
+        """
+        index.add(vectors)
+        return cls(
+            index,
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+            embeddings
+        )
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed and normalize a query as a (1, dim) float32 matrix."""
+        return self._query_matrix(self.embeddings.embed_query(query))
+
+    async def _aembed_query(self, query: str) -> np.ndarray:
+        """Embed (without blocking the event loop) and normalize a query as a (1, dim) float32 matrix."""
+        return self._query_matrix(await self.embeddings.aembed_query(query))
+
+    @staticmethod
+    def _query_matrix(embedding: list[float]) -> np.ndarray:
+        """Normalize a query embedding as a (1, dim) float32 matrix."""
+        vector = np.asarray([embedding], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _search_ids(self, query_vector: np.ndarray, k: int) -> list[int]:
+        """Get the ids of the k nearest chunks, nearest first."""
+        _, ids = self.index.search(query_vector, min(k, self.index.ntotal))
+        return [int(i) for i in ids[0] if i != -1]
+
+    def _to_documents(self, ids: list[int]) -> list[Document]:
+        """Build Documents for chunk ids."""
+        return [Document(page_content=self.texts[i], metadata=self.metadatas[i]) for i in ids]
+
+    def similarity_search(self, query: str, k: int = 4) -> list[Document]:
+        """
+        Get the k chunks most similar to a query.
+
+        Args:
+            query: Query text
+            k: Number of chunks to return
+
+        Returns:
+            Matching chunks, most similar first
+        """
+        return self._to_documents(self._search_ids(self._embed_query(query), k))
+
+    async def asimilarity_search(self, query: str, k: int = 4) -> list[Document]:
+        """Async similarity_search: the query is embedded over the shared async client."""
+        return self._to_documents(self._search_ids(await self._aembed_query(query), k))
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5
+    ) -> list[Document]:
+        """
+        Get k relevant but mutually diverse chunks (Maximal Marginal Relevance).
+
+        Args:
+            query: Query text
+            k: Number of chunks to return
+            fetch_k: Number of nearest chunks to choose from
+            lambda_mult: 1 favours relevance only, 0 favours diversity only
+
+        Returns:
+            Selected chunks, in selection order
+        """
+        return self._mmr_by_vector(self._embed_query(query), k, fetch_k, lambda_mult)
+
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5
+    ) -> list[Document]:
+        """Async max_marginal_relevance_search: the query is embedded over the shared async client."""
+        return self._mmr_by_vector(await self._aembed_query(query), k, fetch_k, lambda_mult)
+
+    def _mmr_by_vector(self, query_vector: np.ndarray, k: int, fetch_k: int, lambda_mult: float) -> list[Document]:
+        """Run MMR selection for a normalized query vector."""
+        candidate_ids = self._search_ids(query_vector, fetch_k)
+        if not candidate_ids:
+            return []
+
+        candidates = np.vstack([self.index.reconstruct(i) for i in candidate_ids]).astype(np.float32)
+        faiss.normalize_L2(candidates)
+        query_similarity = candidates @ query_vector[0]
+        pairwise_similarity = candidates @ candidates.T
+
+        selected = [int(np.argmax(query_similarity))]
+        while len(selected) < min(k, len(candidate_ids)):
+            redundancy = pairwise_similarity[:, selected].max(axis=1)
+            scores = lambda_mult * query_similarity - (1 - lambda_mult) * redundancy
+            scores[selected] = -np.inf
+            selected.append(int(np.argmax(scores)))
+
+        return self._to_documents([candidate_ids[i] for i in selected])
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index and chunk store to a directory.
+
+        Args:
+            path: Directory to write to (created if missing)
+        """
+        os.makedirs(path, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(path, INDEX_FILENAME))
+        with open(os.path.join(path, DOCSTORE_FILENAME), "wb") as f:
+            f.write(orjson.dumps({"texts": self.texts, "metadatas": self.metadatas}))
+
+    @classmethod
+    def load(cls, path: str, embeddings: Embeddings) -> Optional["DocumentVectorStore"]:
+        """
+        Load a persisted vectorstore, memory-mapping the index where supported.
+
+        Args:
+            path: Directory written by save()
+            embeddings: Embeddings used for queries
+
+        Returns:
+            DocumentVectorStore, or None if nothing was persisted at path
+        """
+        index_path = os.path.join(path, INDEX_FILENAME)
+        docstore_path = os.path.join(path, DOCSTORE_FILENAME)
+        if not (os.path.exists(index_path) and os.path.exists(docstore_path)):
+            return None
+
+        # The OS page cache holds a mapped index once for all workers
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Index types this FAISS build cannot map are read into memory
+            index = faiss.read_index(index_path)
+
+        with open(docstore_path, "rb") as f:
+            docstore = orjson.loads(f.read())
+        return cls(index, docstore["texts"], docstore["metadatas"], embeddings)
@@ -6,12 +6,12 @@ from google.oauth2 import service_account
 from app.config import settings
 
 
-def get_firestore_db() -> firestore.Client:
+def _get_credentials() -> service_account.Credentials:
     """
-    Get Firestore database client instance.
+    Build service account credentials from settings.
     
     Returns:
-        Firestore Client instance
+        Service account credentials
     """
     # Read JSON from settings (which reads from env)
     service_account_json_str = settings.google_application_credentials_json
@@ -25,7 +25,27 @@ def get_firestore_db() -> firestore.Client:
         cred = service_account.Credentials.from_service_account_info(cred_info)
     else:
       raise ValueError("GOOGLE_APPLICATION_CREDENTIALS_JSON environment variable is not set")
-    return firestore.Client(credentials=cred)
+    return cred
+
+
+def get_firestore_db() -> firestore.Client:
+    """
+    Get Firestore database client instance.
+    
+    Returns:
+        Firestore Client instance
+    """
+    return firestore.Client(credentials=_get_credentials())
+
+
+def get_async_firestore_db() -> firestore.AsyncClient:
+    """
+    Get async Firestore database client instance for use inside async handlers.
+    
+    Returns:
+        Firestore AsyncClient instance
+    """
+    return firestore.AsyncClient(credentials=_get_credentials())
 
 
 # Global db instance (for backward compatibility during migration)
@@ -1,6 +1,6 @@
 """Dependency injection for FastAPI routes."""
 from fastapi import Depends, Request
-from app.core.security import verify_firebase_token, get_current_user_uid
+from app.core.security import verify_firebase_token
 from app.db.firestore_client import get_firestore_db
 
 
@@ -16,16 +16,19 @@ def get_current_user(request: Request) -> dict:
     return verify_firebase_token(request)
 
 
-def get_current_user_id(request: Request) -> str:
+def get_current_user_id(current_user: dict = Depends(get_current_user)) -> str:
     """
     Dependency to get current user UID.
     
+    Reuses get_current_user, so FastAPI's per-request dependency cache verifies
+    the token only once even when a route also depends on get_current_user.
+    
     Usage:
         @router.get("/protected")
         def protected_route(uid: str = Depends(get_current_user_id)):
             return {"uid": uid}
     """
-    return get_current_user_uid(request)
+    return current_user["uid"]
 
 
 def get_db():
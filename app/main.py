@@ -1,10 +1,16 @@
 """Main FastAPI application."""
 import os
+from contextlib import asynccontextmanager
 import firebase_admin
 from firebase_admin import credentials
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.core.http_client import close_http_client
+from app.core.document_loading import shutdown_process_pool
+from app.middleware.body_size import MaxBodySizeMiddleware
+from app.services.pdf_service import pdf_service
 from app.api.v1 import auth, chat, document, resume, usage, help
 
 # Initialize Firebase Admin SDK
@@ -32,13 +38,29 @@ if not firebase_admin._apps:
     if cred:
         firebase_admin.initialize_app(cred)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown hooks."""
+    yield
+    # Release pooled outbound connections, document loading workers and the PDF browser
+    await close_http_client()
+    shutdown_process_pool()
+    await pdf_service.close()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Refuse oversized uploads before they are read; added first so CORS headers still wrap the 413
+app.add_middleware(MaxBodySizeMiddleware, max_body_size=settings.max_request_body_size)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
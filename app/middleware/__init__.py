@@ -0,0 +1,2 @@
+"""ASGI middleware."""
+
@@ -0,0 +1,55 @@
+"""Request body size limit enforced before route handlers read uploads."""
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class MaxBodySizeMiddleware:
+    """
+    Reject request bodies larger than max_body_size with 413.
+    
+    Requests declaring a larger Content-Length are refused before any body is
+    received; chunked bodies are counted as they stream in. Implemented as plain
+    ASGI so streaming responses pass through untouched.
+    """
+    
+    def __init__(self, app: ASGIApp, max_body_size: int):
+        """
+        Initialize middleware.
+        
+        Args:
+            app: Wrapped ASGI application
+            max_body_size: Largest accepted request body in bytes
+        """
+        self.app = app
+        self.max_body_size = max_body_size
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Check the declared size, then count the body as the app reads it."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = ORJSONResponse(status_code=413, content={"detail": self._too_large_detail()})
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    # Raised inside the app, so FastAPI turns it into a normal 413 response
+                    raise HTTPException(status_code=413, detail=self._too_large_detail())
+            return message
+        
+        await self.app(scope, limited_receive, send)
+    
+    def _too_large_detail(self) -> str:
+        """Error detail for oversized bodies."""
+        return f"Request body too large. Max size: {self.max_body_size / 1024 / 1024}MB"
@@ -1,10 +1,21 @@
 """Authentication service for user management."""
-import requests
-from fastapi import HTTPException
+import asyncio
+import time
+from typing import Coroutine, Optional
+import httpx
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from firebase_admin import firestore
 from app.config import settings
-from app.db.firestore_client import get_firestore_db
-from app.core.security import decrypt_password, encrypt_api_key, decrypt_api_key
+from app.core.http_client import http_client
+from app.db.firestore_client import get_firestore_db, get_async_firestore_db
+from app.core.security import (
+    decrypt_password,
+    encrypt_api_key,
+    decrypt_api_key,
+    verify_firebase_token,
+)
 from app.models.schemas import (
     LoginRequest,
     SignupRequest,
@@ -14,14 +25,29 @@ from app.models.schemas import (
 )
 
 
+IDENTITY_TOOLKIT_URL = "https://identitytoolkit.googleapis.com/v1/accounts"
+JSON_HEADERS = {"Content-Type": "application/json"}
+# A caller's ID token may replace the current-password check only if it was signed in this recently
+RECENT_SIGN_IN_MAX_AGE = 300
+
+
 class AuthService:
     """Service for authentication operations."""
     
     def __init__(self):
         self.db = get_firestore_db()
+        self.async_db = get_async_firestore_db()
+        # Collection references are reused across requests
+        self.users_ref = self.db.collection("users")
+        self.async_users_ref = self.async_db.collection("users")
+        # Strong references to fire-and-forget tasks so they aren't garbage collected mid-flight
+        self._background_tasks: set[asyncio.Task] = set()
         self.firebase_api_key = settings.firebase_api_key
+        # Firebase REST endpoints are fixed for the process lifetime - build them once
+        self.sign_in_url = f"{IDENTITY_TOOLKIT_URL}:signInWithPassword?key={self.firebase_api_key}"
+        self.update_url = f"{IDENTITY_TOOLKIT_URL}:update?key={self.firebase_api_key}"
     
-    def login(self, data: LoginRequest) -> dict:
+    async def login(self, data: LoginRequest) -> dict:
         """
         Authenticate user with email and password.
         
@@ -49,14 +75,23 @@ class AuthService:
                 detail="Firebase API key not configured"
             )
         
-        url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={self.firebase_api_key}"
         payload = {
             "email": data.email,
             "password": decrypted_password,
             "returnSecureToken": True
         }
         
-        response = requests.post(url, json=payload)
+        try:
+            response = await http_client.post(
+                self.sign_in_url,
+                content=orjson.dumps(payload),
+                headers=JSON_HEADERS
+            )
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Authentication service unavailable: {str(e)}"
+            )
         
         if response.status_code != 200:
             error_detail = "Invalid credentials"
@@ -84,10 +119,14 @@ class AuthService:
         res_data = response.json()
         user_id = res_data["localId"]
         
-        # Update last login timestamp
-        self.db.collection("users").document(user_id).update({
-            "last_login": firestore.SERVER_TIMESTAMP
-        })
+        # Update last login timestamp without holding up the response;
+        # merge=True also covers users whose document doesn't exist yet
+        self._run_in_background(
+            self.async_users_ref.document(user_id).set(
+                {"last_login": firestore.SERVER_TIMESTAMP},
+                merge=True
+            )
+        )
         
         return {
             "message": "User logged in successfully",
@@ -98,7 +137,19 @@ class AuthService:
             "expiresIn": res_data["expiresIn"]
         }
     
-    def signup(self, data: SignupRequest) -> dict:
+    def _run_in_background(self, coro: Coroutine) -> None:
+        """Schedule a coroutine without awaiting it; failures are logged."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_task_done)
+    
+    def _on_background_task_done(self, task: asyncio.Task) -> None:
+        """Release a finished background task and log its error, if any."""
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[Warning] Background Firestore write failed: {task.exception()}")
+    
+    async def signup(self, data: SignupRequest) -> dict:
         """
         Create new user account.
         
@@ -113,8 +164,9 @@ class AuthService:
         
         user_id = data.uid
         
-        user_doc = self.db.collection("users").document(user_id)
-        user_doc.set({
+        # All signup writes go through one batch: a single atomic commit RPC
+        batch = self.async_db.batch()
+        batch.set(self.async_users_ref.document(user_id), {
             "name": data.name,
             "uid": user_id,
             "email": data.email,
@@ -124,6 +176,7 @@ class AuthService:
             "last_login": firestore.SERVER_TIMESTAMP,
             "role": "user",
         })
+        await batch.commit()
         
         return {
             "message": "User created successfully",
@@ -131,7 +184,7 @@ class AuthService:
             "email": data.email
         }
     
-    def google_signup(self, data: GoogleSignupRequest) -> dict:
+    async def google_signup(self, data: GoogleSignupRequest) -> dict:
         """
         Create new user account via Google OAuth.
         
@@ -143,8 +196,8 @@ class AuthService:
         """
         user_id = data.uid
         
-        user_doc = self.db.collection("users").document(user_id)
-        user_doc.set({
+        batch = self.async_db.batch()
+        batch.set(self.async_users_ref.document(user_id), {
             "uid": user_id,
             "email": data.email,
             "name": data.name,
@@ -153,6 +206,7 @@ class AuthService:
             "last_login": firestore.SERVER_TIMESTAMP,
             "role": "user"
         })
+        await batch.commit()
         
         return {
             "message": "User created successfully",
@@ -174,7 +228,7 @@ class AuthService:
         Raises:
             HTTPException: If user not found
         """
-        user_doc = self.db.collection("users").document(uid).get()
+        user_doc = self.users_ref.document(uid).get()
         if not user_doc.exists:
             raise HTTPException(status_code=404, detail="User not found in database")
         data = user_doc.to_dict()
@@ -198,11 +252,37 @@ class AuthService:
         Returns:
             Decrypted API key string or None
         """
-        user_doc = self.db.collection("users").document(uid).get()
+        user_doc = self.users_ref.document(uid).get()
         if not user_doc.exists:
             return None
-        data = user_doc.to_dict()
-        encrypted_key = data.get("gemini_api_key")
+        return self.extract_gemini_api_key(user_doc.to_dict())
+
+    async def get_gemini_api_key_async(self, uid: str):
+        """
+        Get user's Gemini API key without blocking the event loop.
+        
+        Args:
+            uid: User ID
+            
+        Returns:
+            Decrypted API key string or None
+        """
+        user_doc = await self.async_users_ref.document(uid).get()
+        if not user_doc.exists:
+            return None
+        return self.extract_gemini_api_key(user_doc.to_dict())
+
+    def extract_gemini_api_key(self, user_data: dict):
+        """
+        Get decrypted Gemini API key from already-fetched user document data.
+        
+        Args:
+            user_data: User document data
+            
+        Returns:
+            Decrypted API key string or None
+        """
+        encrypted_key = user_data.get("gemini_api_key")
         if not encrypted_key:
             return None
         
@@ -242,7 +322,7 @@ class AuthService:
         except ValueError as e:
             raise HTTPException(status_code=500, detail=f"Encryption failed: {str(e)}")
         
-        ref = self.db.collection("users").document(uid)
+        ref = self.users_ref.document(uid)
         if not ref.get().exists:
             raise HTTPException(status_code=404, detail="User not found")
         ref.update({
@@ -261,7 +341,7 @@ class AuthService:
         Returns:
             Confirmation message
         """
-        ref = self.db.collection("users").document(uid)
+        ref = self.users_ref.document(uid)
         if not ref.get().exists:
             raise HTTPException(status_code=404, detail="User not found")
         ref.update({
@@ -270,12 +350,14 @@ class AuthService:
         })
         return {"message": "Gemini API key removed successfully", "has_gemini_key": False}
     
-    def update_profile(self, email: str, update_data: UpdateProfileRequest, uid: str) -> dict:
+    async def update_profile(self, update_data: UpdateProfileRequest, uid: str) -> dict:
         """
         Update user profile.
         
+        The user document is keyed by uid, so the caller's own profile is
+        addressed directly from the verified token.
+        
         Args:
-            email: User email
             update_data: Update profile request data
             uid: User ID from token
             
@@ -285,19 +367,12 @@ class AuthService:
         Raises:
             HTTPException: If user not found or update fails
         """
-        users_ref = self.db.collection("users")
-        query = users_ref.where("email", "==", email).limit(1)
-        results = query.get()
+        user_ref = self.async_users_ref.document(uid)
+        user_doc = await user_ref.get()
         
-        if not results:
+        if not user_doc.exists:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_doc = results[0]
-        
-        # Verify the user owns this profile
-        if user_doc.id != uid:
-            raise HTTPException(status_code=403, detail="Not authorized to update this profile")
-        
         # Prepare update data
         update_dict = {}
         if update_data.name is not None:
@@ -307,21 +382,25 @@ class AuthService:
         
         # Update the user document
         if update_dict:
-            user_doc.reference.update(update_dict)
+            await user_ref.update(update_dict)
         
-        # Get updated user data
-        updated_user = user_doc.reference.get()
-        user_data = updated_user.to_dict()
+        # Merge locally instead of re-reading the document
+        user_data = user_doc.to_dict()
+        user_data.update(update_dict)
         if 'password' in user_data:
             del user_data['password']
         return user_data
     
-    def update_password(self, data: UpdatePasswordRequest) -> dict:
+    async def update_password(self, data: UpdatePasswordRequest, request: Optional[Request] = None) -> dict:
         """
         Update user password.
         
+        A recently signed-in bearer token for the same account is used directly for
+        the update; otherwise the current password is verified by signing in first.
+        
         Args:
             data: Update password request data
+            request: Optional FastAPI Request carrying the caller's ID token
             
         Returns:
             New tokens after password update
@@ -329,31 +408,28 @@ class AuthService:
         Raises:
             HTTPException: If current password is incorrect or update fails
         """
-        # Decrypt passwords from frontend
-        decrypted_current_password = decrypt_password(data.current_password)
         decrypted_new_password = decrypt_password(data.new_password)
         
-        # First, sign in with current password to get a fresh token
-        sign_in_url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={self.firebase_api_key}"
-        sign_in_response = requests.post(sign_in_url, json={
-            "email": data.email,
-            "password": decrypted_current_password,
-            "returnSecureToken": True
-        })
-        
-        if sign_in_response.status_code != 200:
-            raise HTTPException(status_code=401, detail="Current password is incorrect")
-        
-        # Get the fresh token
-        fresh_token = sign_in_response.json()["idToken"]
+        fresh_token = await self._get_recent_id_token(request, data.email) if request else None
+        if fresh_token is None:
+            fresh_token = await self._sign_in_for_token(data)
         
         # Update the password
-        update_url = f"https://identitytoolkit.googleapis.com/v1/accounts:update?key={self.firebase_api_key}"
-        update_response = requests.post(update_url, json={
-            "idToken": fresh_token,
-            "password": decrypted_new_password,
-            "returnSecureToken": True
-        })
+        try:
+            update_response = await http_client.post(
+                self.update_url,
+                content=orjson.dumps({
+                    "idToken": fresh_token,
+                    "password": decrypted_new_password,
+                    "returnSecureToken": True
+                }),
+                headers=JSON_HEADERS
+            )
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Authentication service unavailable: {str(e)}"
+            )
         
         if update_response.status_code != 200:
             raise HTTPException(status_code=400, detail="Failed to update password")
@@ -366,6 +442,75 @@ class AuthService:
             "refreshToken": new_tokens.get("refreshToken"),
             "expiresIn": new_tokens.get("expiresIn")
         }
+    
+    async def _get_recent_id_token(self, request: Request, email: str) -> Optional[str]:
+        """
+        Return the caller's bearer token if it belongs to ``email`` and is a recent sign-in.
+        
+        Args:
+            request: FastAPI Request object
+            email: Email of the account whose password is changing
+            
+        Returns:
+            The ID token, or None if no valid bearer token was supplied or it is too old
+            
+        Raises:
+            HTTPException: If a valid token belongs to another account
+        """
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return None
+        
+        # Sync verification may fetch signing certificates; keep it off the event loop
+        try:
+            claims = await run_in_threadpool(verify_firebase_token, request)
+        except HTTPException:
+            # The endpoint is unauthenticated; a stale or bad token falls back to the password check
+            return None
+        
+        if claims.get("email") != email:
+            raise HTTPException(status_code=403, detail="Token does not match this account")
+        
+        if time.time() - claims.get("auth_time", 0) > RECENT_SIGN_IN_MAX_AGE:
+            return None
+        
+        return auth_header.split("Bearer ")[1]
+    
+    async def _sign_in_for_token(self, data: UpdatePasswordRequest) -> str:
+        """
+        Verify the current password by signing in and return the fresh ID token.
+        
+        Args:
+            data: Update password request data
+            
+        Returns:
+            Fresh Firebase ID token
+            
+        Raises:
+            HTTPException: If current password is incorrect
+        """
+        decrypted_current_password = decrypt_password(data.current_password)
+        
+        try:
+            sign_in_response = await http_client.post(
+                self.sign_in_url,
+                content=orjson.dumps({
+                    "email": data.email,
+                    "password": decrypted_current_password,
+                    "returnSecureToken": True
+                }),
+                headers=JSON_HEADERS
+            )
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Authentication service unavailable: {str(e)}"
+            )
+        
+        if sign_in_response.status_code != 200:
+            raise HTTPException(status_code=401, detail="Current password is incorrect")
+        
+        return sign_in_response.json()["idToken"]
 
 
 # Singleton instance
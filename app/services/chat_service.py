@@ -1,32 +1,26 @@
 """Chat service for AI conversations."""
-import requests
+import asyncio
+import uuid
+from collections import deque
+from functools import lru_cache
+from typing import AsyncIterator
+import httpx
+import orjson
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.config import settings
-from app.db.firestore_client import get_firestore_db
+from app.core.http_client import http_client
+from app.core.streaming import sse_event, stream_gemini_text
+from app.db.firestore_client import get_firestore_db, get_async_firestore_db
 from firebase_admin import firestore
 from app.services.usage_limit_service import usage_limit_service
 from app.services.auth_service import auth_service
 
 
-class ChatService:
-    """Service for chat operations."""
-    
-    def __init__(self):
-        self.db = get_firestore_db()
-        self.model = settings.gemini_model
-        self.api_url = settings.gemini_api_url
-    
-    def get_system_prompt(self, user_name: str) -> str:
-        """
-        Generate system prompt for chat.
-        
-        Args:
-            user_name: User's name
-            
-        Returns:
-            System prompt string
-        """
-        return f"""You are SmartChat AI, a friendly and helpful AI assistant. Always respond in a polite, natural tone as if you're chatting with a real person.
-    When explaining any topic, try to address the user by their name ("{user_name}") when appropriate, and use expressions and emojis to match the mood and context of the conversation.
+SYSTEM_PROMPT_PREFIX = """You are SmartChat AI, a friendly and helpful AI assistant. Always respond in a polite, natural tone as if you're chatting with a real person.
+    When explaining any topic, try to address the user by their name (\""""
+
+SYSTEM_PROMPT_SUFFIX = """\") when appropriate, and use expressions and emojis to match the mood and context of the conversation.
     Guidelines:
     1. Always consider the context of the entire conversation. You will receive the last 10 messages from the chat history—use them to understand the flow, user intent, and any ongoing topics.
     2. If the user's message is unclear or ambiguous, kindly ask for clarification instead of making assumptions.
@@ -60,8 +54,70 @@ class ChatService:
     17. If there is no previous conversation history, start with a friendly greeting and a brief offer to help, without over-explaining or providing unnecessary context.
 
     Your goal is to help the user, maintain a natural conversation flow, and provide accurate, context-aware assistance."""
+
+
+@lru_cache(maxsize=4096)
+def _build_system_prompt(user_name: str) -> str:
+    """Build the system prompt once per distinct first name."""
+    return SYSTEM_PROMPT_PREFIX + user_name + SYSTEM_PROMPT_SUFFIX
+
+
+# Gemini generateContent body: {"contents": [{"parts": [{"text": <prompt>}]}]}
+GEMINI_BODY_PREFIX = b'{"contents":[{"parts":[{"text":'
+GEMINI_BODY_SUFFIX = b'}]}]}'
+
+
+@lru_cache(maxsize=4096)
+def _system_prompt_fragment(user_name: str) -> bytes:
+    """
+    JSON-encode the system turn of the prompt once per distinct first name.
+    
+    Returns the encoded string without its closing quote, so the encoded
+    conversation (without its opening quote) can be appended to form one string.
+    """
+    return orjson.dumps(f"system: {_build_system_prompt(user_name)}\n")[:-1]
+
+
+class ChatService:
+    """Service for chat operations."""
+    
+    def __init__(self):
+        self.db = get_firestore_db()
+        self.async_db = get_async_firestore_db()
+        # Collection references are reused across requests
+        self.sessions_ref = self.db.collection("sessions")
+        self.async_users_ref = self.async_db.collection("users")
+        self.async_sessions_ref = self.async_db.collection("sessions")
+        # Queries are immutable, so each session's history query is built once and reused
+        self._last_messages_query = lru_cache(maxsize=2048)(self._build_last_messages_query)
+        self.model = settings.gemini_model
+        self.api_url = settings.gemini_api_url
+        # Endpoints and server-key headers are fixed for the process lifetime - build them once
+        self.generate_url = f"{self.api_url}/{self.model}:generateContent"
+        self.stream_url = f"{self.api_url}/{self.model}:streamGenerateContent"
+        self.default_headers = {
+            "x-goog-api-key": settings.gemini_api_key,
+            "Content-Type": "application/json"
+        }
+    
+    def get_system_prompt(self, user_name: str) -> str:
+        """
+        Generate system prompt for chat.
+        
+        Args:
+            user_name: User's name
+            
+        Returns:
+            System prompt string
+        """
+        return _build_system_prompt(user_name)
     
-    def get_last_10_messages(self, session_id: str) -> list[dict]:
+    def _build_last_messages_query(self, session_id: str):
+        """Build the newest-first, last-10 messages query for a session."""
+        messages_ref = self.async_sessions_ref.document(session_id).collection("messages")
+        return messages_ref.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(10)
+    
+    async def get_last_10_messages(self, session_id: str) -> list[dict]:
         """
         Get last 10 messages from chat history.
         
@@ -71,20 +127,18 @@ class ChatService:
         Returns:
             List of message dictionaries with role and content
         """
-        messages_ref = self.db.collection("sessions").document(session_id).collection("messages")
-        query = messages_ref.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(10)
-        results = query.stream()
-        messages = list(results)[::-1]
+        query = self._last_messages_query(session_id)
         
-        context = []
-        for msg in messages:
+        # Query returns newest first; prepend so the context ends up oldest first
+        context = deque(maxlen=10)
+        async for msg in query.stream():
             data = msg.to_dict()
             role = "user" if data["sender"] == "user" else "assistant"
-            context.append({"role": role, "content": data["content"]})
+            context.appendleft({"role": role, "content": data["content"]})
         
-        return context
+        return list(context)
     
-    def get_user_name(self, user_id: str) -> str:
+    async def get_user_name(self, user_id: str) -> str:
         """
         Get user's first name from database.
         
@@ -94,45 +148,85 @@ class ChatService:
         Returns:
             User's first name or "there" as default
         """
-        user_doc = self.db.collection("users").document(str(user_id)).get()
-        if user_doc.exists:
-            data = user_doc.to_dict()
-            name = data.get("name", "there")
-            return name.split()[0] if name else "there"
-        return "there"
+        user_doc = await self.async_users_ref.document(str(user_id)).get()
+        return self._get_first_name(user_doc.to_dict() if user_doc.exists else {})
+    
+    def _get_first_name(self, user_data: dict) -> str:
+        """Get first name from user document data, or "there" as default."""
+        name = user_data.get("name", "there")
+        return name.split()[0] if name else "there"
     
-    def ask_gemini(self, messages: list[dict], api_key: str = None) -> str:
+    async def _get_documents(self, *refs) -> list:
         """
-        Send messages to Gemini API and get response.
+        Fetch several documents in a single BatchGet RPC.
         
         Args:
-            messages: List of message dictionaries
-            api_key: Optional Gemini API key (uses user's key or settings)
+            refs: Async document references
             
         Returns:
-            AI response text
+            Document snapshots in the same order as refs (missing docs have exists=False)
         """
-        key = api_key or settings.gemini_api_key
-        headers = {
-            "x-goog-api-key": key,
-            "Content-Type": "application/json"
-        }
+        snapshots = {snap.reference.path: snap async for snap in self.async_db.get_all(list(refs))}
+        return [snapshots[ref.path] for ref in refs]
+    
+    def _build_gemini_request(self, user_name: str, conversation: list[dict], api_key: str = None) -> tuple[dict, bytes]:
+        """
+        Build Gemini request headers and serialized JSON body for a conversation.
         
-        prompt = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
-        json_body = {
-            "contents": [
-                {"parts": [{"text": prompt}]}
-            ]
-        }
+        The body is assembled from bytes: the JSON-encoded system prompt fragment is
+        cached per user name, so only the conversation is encoded per request.
         
-        resp = requests.post(
-            f"{self.api_url}/{self.model}:generateContent",
-            headers=headers,
-            json=json_body
+        Args:
+            user_name: User's first name for the system prompt
+            conversation: Chat history plus the new user message
+            api_key: Optional Gemini API key (uses user's key or settings)
+            
+        Returns:
+            Tuple of (headers, body bytes)
+        """
+        if api_key:
+            headers = {
+                "x-goog-api-key": api_key,
+                "Content-Type": "application/json"
+            }
+        else:
+            headers = self.default_headers
+        
+        conversation_text = "\n".join(f"{m['role']}: {m['content']}" for m in conversation)
+        body = (
+            GEMINI_BODY_PREFIX
+            + _system_prompt_fragment(user_name)
+            + orjson.dumps(conversation_text)[1:]  # drop opening quote, keep closing quote
+            + GEMINI_BODY_SUFFIX
         )
+        return headers, body
+    
+    async def ask_gemini(self, user_name: str, conversation: list[dict], api_key: str = None) -> str:
+        """
+        Send conversation to Gemini API and get response.
+        
+        Args:
+            user_name: User's first name for the system prompt
+            conversation: List of message dictionaries (history plus new message)
+            api_key: Optional Gemini API key (uses user's key or settings)
+            
+        Returns:
+            AI response text
+        """
+        headers, body = self._build_gemini_request(user_name, conversation, api_key)
+        
+        try:
+            resp = await http_client.post(
+                self.generate_url,
+                headers=headers,
+                content=body,
+                timeout=60
+            )
+        except httpx.RequestError as e:
+            return f"Error: Could not reach Gemini API - {str(e)}"
         
         if resp.status_code == 200:
-            data = resp.json()
+            data = orjson.loads(resp.content)
             try:
                 return data["candidates"][0]["content"]["parts"][0]["text"]
             except Exception:
@@ -140,9 +234,31 @@ class ChatService:
         else:
             return f"Error: {resp.status_code} - {resp.text}"
     
-    def send_message(self, user_id: str, message: str, session_id: str = None, model_name: str = None) -> dict:
+    async def stream_gemini(self, user_name: str, conversation: list[dict], api_key: str = None) -> AsyncIterator[str]:
         """
-        Process chat message and get AI response.
+        Stream Gemini response text as it is generated (streamGenerateContent over SSE).
+        
+        Args:
+            user_name: User's first name for the system prompt
+            conversation: List of message dictionaries (history plus new message)
+            api_key: Optional Gemini API key (uses user's key or settings)
+            
+        Yields:
+            AI response text chunks
+        """
+        headers, body = self._build_gemini_request(user_name, conversation, api_key)
+        
+        try:
+            async for text in stream_gemini_text(self.stream_url, headers=headers, content=body, timeout=60):
+                yield text
+        except httpx.HTTPStatusError as e:
+            yield f"Error: {e.response.status_code} - {e.response.text}"
+        except httpx.RequestError as e:
+            yield f"Error: Could not reach Gemini API - {str(e)}"
+    
+    async def _start_turn(self, user_id: str, message: str, session_id: str = None, model_name: str = None) -> dict:
+        """
+        Enforce limits, persist the user message and build the Gemini conversation.
         
         Args:
             user_id: User ID
@@ -151,22 +267,34 @@ class ChatService:
             model_name: Optional model name to use
             
         Returns:
-            Dictionary with AI response text and session_id
+            Turn dictionary with session_id, messages_ref, user_name, conversation,
+            api_key and model_name
+            
+        Raises:
+            HTTPException: If a usage limit is reached
         """
         # Generate session_id if not provided
         if not session_id:
-            import uuid
             session_id = str(uuid.uuid4())
 
-        # Check session and message limits
-        session_ref = self.db.collection("sessions").document(session_id)
-        session_doc = session_ref.get()
+        session_ref = self.async_sessions_ref.document(session_id)
+        user_ref = self.async_users_ref.document(str(user_id))
+        
+        # Session + user docs in one BatchGet RPC, history query in parallel with it.
+        # History is read before the new message is written, so it holds prior turns only.
+        (session_doc, user_doc), history = await asyncio.gather(
+            self._get_documents(session_ref, user_ref),
+            self.get_last_10_messages(session_id)
+        )
+        user_data = user_doc.to_dict() if user_doc.exists else {}
         
+        # Check session and message limits
         if not session_doc.exists:
             # New session - check session count limit
-            usage_limit_service.check_session_limit(user_id)
+            # Limit checks use the sync Firestore client; keep them off the event loop
+            await run_in_threadpool(usage_limit_service.check_session_limit, user_id)
             # Create session document
-            session_ref.set({
+            await session_ref.set({
                 "user_id": user_id,
                 "model_name": model_name or self.model,
                 "created_at": firestore.SERVER_TIMESTAMP,
@@ -174,16 +302,16 @@ class ChatService:
             })
         else:
             # Existing session - check message count limit
-            usage_limit_service.check_message_limit(session_id, user_id)
+            await run_in_threadpool(usage_limit_service.check_message_limit, session_id, user_id)
             # Update session timestamp and optionally model
             update_data = {"updated_at": firestore.SERVER_TIMESTAMP}
             if model_name:
                 update_data["model_name"] = model_name
-            session_ref.update(update_data)
+            await session_ref.update(update_data)
             
         # Save user message to Firestore
         messages_ref = session_ref.collection("messages")
-        messages_ref.add({
+        await messages_ref.add({
             "sender": "user",
             "content": message,
             "user_id": user_id,
@@ -191,28 +319,82 @@ class ChatService:
             "timestamp": firestore.SERVER_TIMESTAMP
         })
 
-        user_name = self.get_user_name(user_id)
-        history = self.get_last_10_messages(session_id)
-        messages = [{"role": "system", "content": self.get_system_prompt(user_name)}] + history
-        messages.append({"role": "user", "content": message})
-        
-        user_api_key = auth_service.get_gemini_api_key(user_id)
-        reply = self.ask_gemini(messages, api_key=user_api_key)
+        conversation = history + [{"role": "user", "content": message}]
         
-        # Save assistant response to Firestore
-        messages_ref.add({
+        return {
+            "session_id": session_id,
+            "user_id": user_id,
+            "messages_ref": messages_ref,
+            "user_name": self._get_first_name(user_data),
+            "conversation": conversation,
+            "api_key": auth_service.extract_gemini_api_key(user_data),
+            "model_name": model_name or self.model
+        }
+    
+    async def _save_reply(self, turn: dict, reply: str) -> None:
+        """Save assistant response to Firestore."""
+        await turn["messages_ref"].add({
             "sender": "assistant",
             "content": reply,
-            "user_id": user_id,
-            "model_name": model_name or self.model,
+            "user_id": turn["user_id"],
+            "model_name": turn["model_name"],
             "timestamp": firestore.SERVER_TIMESTAMP
         })
+    
+    async def send_message(self, user_id: str, message: str, session_id: str = None, model_name: str = None) -> dict:
+        """
+        Process chat message and get AI response.
+        
+        Args:
+            user_id: User ID
+            message: User message
+            session_id: Chat session ID
+            model_name: Optional model name to use
+            
+        Returns:
+            Dictionary with AI response text and session_id
+        """
+        turn = await self._start_turn(user_id, message, session_id, model_name)
+        reply = await self.ask_gemini(turn["user_name"], turn["conversation"], api_key=turn["api_key"])
+        await self._save_reply(turn, reply)
         
         return {
             "reply": reply,
-            "session_id": session_id
+            "session_id": turn["session_id"]
         }
     
+    async def stream_message(self, user_id: str, message: str, session_id: str = None, model_name: str = None) -> AsyncIterator[bytes]:
+        """
+        Process chat message and stream the AI response as server-sent events.
+        
+        Limits are checked and the user message is saved before this returns, so
+        errors surface as normal HTTP errors rather than mid-stream.
+        
+        Args:
+            user_id: User ID
+            message: User message
+            session_id: Chat session ID
+            model_name: Optional model name to use
+            
+        Returns:
+            Async iterator of SSE event strings: text chunks, then a final
+            event with done=true, the full reply and session_id
+        """
+        turn = await self._start_turn(user_id, message, session_id, model_name)
+        return self._stream_reply(turn)
+    
+    async def _stream_reply(self, turn: dict) -> AsyncIterator[bytes]:
+        """Forward Gemini chunks as SSE events and save the full reply once complete."""
+        parts = []
+        async for text in self.stream_gemini(turn["user_name"], turn["conversation"], api_key=turn["api_key"]):
+            parts.append(text)
+            yield sse_event({"text": text})
+        
+        reply = "".join(parts)
+        await self._save_reply(turn, reply)
+        done_event = {"done": True, "reply": reply, "session_id": turn["session_id"]}
+        yield sse_event(done_event)
+    
     def get_all_sessions(self, user_id: str, limit: int = 50) -> dict:
         """
         Get all sessions for a user.
@@ -224,17 +406,16 @@ class ChatService:
         Returns:
             List of sessions with metadata
         """
-        sessions_ref = self.db.collection("sessions")
         sessions = []
         
         try:
             # Fetch sessions belonging to user without order_by to avoid index requirement
-            query = sessions_ref.where("user_id", "==", user_id).limit(limit * 2)
+            query = self.sessions_ref.where("user_id", "==", user_id).limit(limit * 2)
             session_docs = list(query.stream())
             
             # If no results found with user_id field, try fallback filter
             if not session_docs:
-                all_sessions = sessions_ref.limit(100).stream()
+                all_sessions = self.sessions_ref.limit(100).stream()
                 for doc in all_sessions:
                     data = doc.to_dict()
                     if data.get("user_id") == user_id:
@@ -258,7 +439,7 @@ class ChatService:
             session_id = session_data["session_id"]
             
             # Get message count efficiently
-            messages_ref = self.db.collection("sessions").document(session_id).collection("messages")
+            messages_ref = self.sessions_ref.document(session_id).collection("messages")
             message_count = len(list(messages_ref.stream()))
             
             sessions.append({
@@ -288,11 +469,10 @@ class ChatService:
         Raises:
             HTTPException: If session not found
         """
-        session_ref = self.db.collection("sessions").document(session_id)
+        session_ref = self.sessions_ref.document(session_id)
         session_doc = session_ref.get()
         
         if not session_doc.exists:
-            from fastapi import HTTPException
             raise HTTPException(status_code=404, detail="Session not found")
         
         session_data = session_doc.to_dict()
@@ -324,11 +504,10 @@ class ChatService:
         Raises:
             HTTPException: If session not found
         """
-        session_ref = self.db.collection("sessions").document(session_id)
+        session_ref = self.sessions_ref.document(session_id)
         session_doc = session_ref.get()
         
         if not session_doc.exists:
-            from fastapi import HTTPException
             raise HTTPException(status_code=404, detail="Session not found")
         
         # Get messages ordered by timestamp
@@ -366,17 +545,15 @@ class ChatService:
         Raises:
             HTTPException: If session not found
         """
-        session_ref = self.db.collection("sessions").document(session_id)
+        session_ref = self.sessions_ref.document(session_id)
         session_doc = session_ref.get()
         
         if not session_doc.exists:
-            from fastapi import HTTPException
             raise HTTPException(status_code=404, detail="Session not found")
         
         # Verify ownership if user_id is stored in session
         session_data = session_doc.to_dict()
         if session_data.get("user_id") and session_data.get("user_id") != user_id:
-            from fastapi import HTTPException
             raise HTTPException(status_code=403, detail="Not authorized to delete this session")
         
         # Delete all messages in subcollection
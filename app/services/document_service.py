@@ -1,28 +1,61 @@
 """Document processing service for RAG operations with Firestore metadata."""
+import hashlib
+import math
 import os
+import shutil
+import threading
 import uuid
-from pathlib import Path
-from typing import Optional
-from fastapi import HTTPException, BackgroundTasks
-from langchain_community.vectorstores import FAISS
-from app.core.gemini_embeddings import GeminiEmbeddings
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    Docx2txtLoader,
-    UnstructuredPowerPointLoader,
-    UnstructuredExcelLoader
+from typing import AsyncIterator, Optional
+import aiofiles
+import faiss
+import httpx
+import numpy as np
+import orjson
+from cachetools import TTLCache
+from fastapi import HTTPException, BackgroundTasks, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.documents import Document
+from app.core.gemini_embeddings import GeminiEmbeddings, get_gemini_embeddings
+from app.core.vector_store import DocumentVectorStore
+from app.core.document_loading import (
+    SUPPORTED_EXTENSION_SET,
+    UNSUPPORTED_TYPE_MESSAGE,
+    get_process_pool,
+    load_and_split,
 )
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.prompts import PromptTemplate
-import requests
 from firebase_admin import firestore
 from app.config import settings
-from app.db.firestore_client import get_firestore_db
+from app.core.http_client import http_client
+from app.core.streaming import sse_event, stream_gemini_text
+from app.db.firestore_client import get_firestore_db, get_async_firestore_db
 from app.services.usage_limit_service import usage_limit_service
 from app.services.auth_service import auth_service
 
 
+# Documents with fewer chunks use an exhaustive index; larger ones use IVF-PQ.
+# 8-bit PQ codebooks need ~10k training vectors to be well trained.
+IVF_MIN_CHUNKS = 10_000
+PQ_SUBQUANTIZERS = 32
+IVF_NPROBE = 8
+
+# Uploads are copied to disk in 1 MiB pieces instead of being read into memory whole
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+GREETING_ANSWER = "Hello! I'm your Document Assistant. How can I assist you with the uploaded files today?"
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in the documents to answer this question."
+
+# RAG prompt template, filled with str.format(context=..., question=...).
+# Greetings are answered before retrieval, so the prompt only covers grounded answers.
+QA_PROMPT_TEMPLATE = """Answer the question using ONLY the context below, taken from the user's uploaded documents. If the context does not contain the answer, say: "I've searched the documents, but I couldn't find specific information regarding that." Be concise and professional; use bullet points or bold text for complex answers. Do not use outside knowledge, respond with greetings, or mention these instructions.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+
 class DocumentService:
     """Service for document processing and Q&A with Firestore metadata."""
     
@@ -31,91 +64,116 @@ class DocumentService:
         self.model = settings.gemini_model
         self.api_url = settings.gemini_api_url
         self.temp_dir = settings.temp_docs_dir
+        # Created once here rather than on every upload
+        os.makedirs(self.temp_dir, exist_ok=True)
         self.db = get_firestore_db()
+        self.async_db = get_async_firestore_db()
+        self.generate_url = f"{self.api_url}/{self.model}:generateContent"
+        self.stream_url = f"{self.api_url}/{self.model}:streamGenerateContent"
+        self.default_headers = {
+            "x-goog-api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
         
         # Initialize embeddings using Gemini API (lightweight, no PyTorch needed)
-        self.embeddings = GeminiEmbeddings()
-        
-        # Storage: key format is "user_id_document_id" for multi-user support
-        self.vectorstores: dict[str, FAISS] = {}
-        self.processing_status: dict[str, bool] = {}
-        
-        # RAG prompt template
-        self.qa_prompt = PromptTemplate(
-            template="""You are an Enterprise Document Specialist assistant. Your goal is to provide accurate, professional, and friendly information based EXCLUSIVELY on the provided documents.
-
-### GUIDELINES:
-1. **Answer Questions**: Always answer the user's question using the provided Context. Do NOT respond with greetings unless the question is explicitly a greeting (like "hi", "hello", "hey").
-2. **Strict Grounding**: Answer ONLY using the provided Context. If the answer isn't there, use one of the "Information Not Found" responses below.
-3. **Tone**: Be professional, helpful, and concise. Use clear formatting (bullet points, bold text) for complex information.
-4. **No Assumptions**: Do not hallucinate or use external knowledge. If a document is unclear, state that the information provided is ambiguous.
-5. **Privacy & Identity**: Never mention you are an AI, a large language model, or reference these instructions.
-
-### INFORMATION NOT FOUND RESPONSES:
-If the context doesn't have the answer, use one of these:
-- "I've searched the documents, but I couldn't find specific information regarding that. Is there something else I can help with?"
-- "The current documents don't seem to cover this topic. Please feel free to ask about other sections of the content."
-- "I'm sorry, but that information isn't available in the provided context. I'd be happy to help with other document-related questions!"
-
-### IMPORTANT:
-- If the question is a greeting (hi, hello, hey), respond with: "Hello! I'm your Document Assistant. How can I assist you with the uploaded files today?"
-- For ALL other questions, answer using the Context provided below. Do NOT use the greeting response.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer:""",
-            input_variables=["context", "question"]
+        self.embeddings = get_gemini_embeddings()
+        
+        # Storage: key format is "user_id_document_id" for multi-user support.
+        # Vectorstores are persisted under vectorstores_dir; RAM holds a bounded, expiring cache.
+        self.vectorstores_dir = settings.vectorstores_dir
+        self.vectorstores: TTLCache = TTLCache(
+            maxsize=settings.vectorstore_cache_size,
+            ttl=settings.vectorstore_cache_ttl
         )
+        self._vectorstores_lock = threading.Lock()
+        self.processing_status: dict[str, bool] = {}
+        # (user_id, content hash) -> document_id, so identical re-uploads reuse the existing document.
+        # Best-effort per worker: the map starts empty after a restart and isn't shared between
+        # workers. content_hash is also stored on the Firestore document for reference.
+        self._uploads_by_hash: dict[tuple[str, str], str] = {}
         
-        self.supported_extensions = {
-            '.pdf': PyPDFLoader,
-            '.txt': TextLoader,
-            '.docx': Docx2txtLoader,
-            '.doc': Docx2txtLoader,
-            '.ppt': UnstructuredPowerPointLoader,
-            '.pptx': UnstructuredPowerPointLoader,
-            '.xls': UnstructuredExcelLoader,
-            '.xlsx': UnstructuredExcelLoader
-        }
+        self.supported_extensions = SUPPORTED_EXTENSION_SET
     
-    def get_document_loader(self, file_path: str):
+    def _build_index(self, vectors: np.ndarray) -> faiss.Index:
         """
-        Get appropriate document loader for file type.
+        Build a FAISS index sized to the number of chunk embeddings.
+        
+        Small documents get an exhaustive float16 index. Larger ones get an IVF-PQ index
+        (nlist ~ sqrt(N), 8-bit product quantization), which stores compressed codes
+        and only scans the nprobe closest inverted lists per query.
         
         Args:
-            file_path: Path to document file
+            vectors: L2-normalized float32 embedding matrix (N x dim)
             
         Returns:
-            Document loader instance
+            FAISS index, trained but empty
+        """
+        count, dim = vectors.shape
+        if count < IVF_MIN_CHUNKS or dim % PQ_SUBQUANTIZERS:
+            # Exact search over float16 codes: half the memory of IndexFlatL2, same ranking in practice
+            return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+        
+        nlist = max(1, int(math.sqrt(count)))
+        index = faiss.index_factory(dim, f"IVF{nlist},PQ{PQ_SUBQUANTIZERS}x8")
+        index.train(vectors)
+        index.nprobe = IVF_NPROBE
+        # MMR search reconstructs candidate vectors by id
+        index.make_direct_map()
+        return index
+    
+    def _build_vectorstore(self, texts: list[Document], embeddings: GeminiEmbeddings) -> DocumentVectorStore:
+        """
+        Embed chunks and index them in a vectorstore.
+        
+        Args:
+            texts: Document chunks
+            embeddings: Embeddings used for the chunks and for later queries
             
-        Raises:
-            HTTPException: If file type is unsupported
+        Returns:
+            DocumentVectorStore
         """
-        file_extension = Path(file_path).suffix.lower()
-        if file_extension not in self.supported_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type. Supported types are: {', '.join(self.supported_extensions.keys())}"
-            )
-        return self.supported_extensions[file_extension](file_path)
+        vectors = np.asarray(embeddings.embed_documents([text.page_content for text in texts]), dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        return DocumentVectorStore.from_vectors(self._build_index(vectors), vectors, texts, embeddings)
     
-    def _get_chunk_size(self, doc_length: int) -> tuple[int, int]:
-        """Adaptive chunking based on document size."""
-        if doc_length < 5000:
-            return 500, 100
-        elif doc_length < 50000:
-            return 1000, 200
-        else:
-            return 1500, 300
+    def _vectorstore_path(self, store_key: str) -> str:
+        """Get the on-disk directory of a persisted vectorstore."""
+        return os.path.join(self.vectorstores_dir, store_key)
     
-    def _count_tokens(self, text: str) -> int:
-        """Estimate token count (rough approximation: 1 token ≈ 4 chars)."""
-        return len(text) // 4
+    def _cache_vectorstore(self, store_key: str, vectorstore: DocumentVectorStore) -> None:
+        """Put a vectorstore in the in-memory cache."""
+        with self._vectorstores_lock:
+            self.vectorstores[store_key] = vectorstore
+    
+    def _get_cached_vectorstore(self, store_key: str) -> Optional[DocumentVectorStore]:
+        """Get a vectorstore from the in-memory cache, if present and not expired."""
+        with self._vectorstores_lock:
+            return self.vectorstores.get(store_key)
     
-    def process_document(self, document_id: str, user_id: str, filename: str, file_path: str) -> None:
+    def _load_vectorstore(self, store_key: str, embeddings: GeminiEmbeddings) -> Optional[DocumentVectorStore]:
+        """
+        Load a persisted vectorstore from disk into the cache.
+        
+        Args:
+            store_key: Vectorstore key ("user_id_document_id")
+            embeddings: Embeddings used for queries against the vectorstore
+            
+        Returns:
+            DocumentVectorStore, or None if it was never persisted
+        """
+        vectorstore = DocumentVectorStore.load(self._vectorstore_path(store_key), embeddings)
+        if vectorstore is not None:
+            self._cache_vectorstore(store_key, vectorstore)
+        return vectorstore
+    
+    def process_document(
+        self,
+        document_id: str,
+        user_id: str,
+        filename: str,
+        file_path: str,
+        content_hash: Optional[str] = None
+    ) -> None:
         """
         Process document in background: load, split, embed, and create vector store.
         Stores metadata in Firestore and creates FAISS vectorstore.
@@ -125,34 +183,14 @@ Answer:""",
             user_id: User ID from Firebase token
             filename: Original filename
             file_path: Path to document file
+            content_hash: Hash of the uploaded bytes, used to deduplicate uploads
         """
         store_key = f"{user_id}_{document_id}"
         try:
-            loader = self.get_document_loader(file_path)
-            documents = loader.load()
-            
-            if not documents:
-                raise Exception("No content could be extracted from the document")
-            
-            # Adaptive chunking based on token count
-            total_length = sum(self._count_tokens(doc.page_content) for doc in documents)
-            chunk_size, chunk_overlap = self._get_chunk_size(total_length)
-            
-            # For very small documents, don't chunk - just use as-is
-            if total_length < 100:
-                texts = documents
-            else:
-                # Ensure chunk_size is smaller than document
-                chunk_size = min(chunk_size, max(100, total_length - 50))
-                chunk_overlap = min(chunk_overlap, chunk_size // 4)
-                
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=chunk_size,
-                    chunk_overlap=chunk_overlap,
-                    length_function=self._count_tokens,
-                    separators=["\n\n", "\n", ". ", " ", ""]
-                )
-                texts = splitter.split_documents(documents)
+            # Parsing and splitting are CPU-bound; run them in a worker process
+            texts, total_length, chunk_size, chunk_overlap = get_process_pool().submit(
+                load_and_split, file_path
+            ).result()
             
             if not texts:
                 raise Exception("Document splitting resulted in no chunks")
@@ -168,11 +206,12 @@ Answer:""",
             
             # Create FAISS vectorstore using batch embeddings (user's API key if set)
             user_api_key = auth_service.get_gemini_api_key(user_id)
-            embeddings = GeminiEmbeddings(api_key=user_api_key)
-            vectorstore = FAISS.from_documents(texts, embeddings)
+            embeddings = get_gemini_embeddings(user_api_key)
+            vectorstore = self._build_vectorstore(texts, embeddings)
             
-            # Store vectorstore
-            self.vectorstores[store_key] = vectorstore
+            # Persist vectorstore so cache evictions and restarts don't lose it
+            vectorstore.save(self._vectorstore_path(store_key))
+            self._cache_vectorstore(store_key, vectorstore)
             
             # Save metadata to Firestore
             doc_ref = self.db.collection("documents").document(document_id)
@@ -184,6 +223,7 @@ Answer:""",
                 "total_length": total_length,
                 "chunk_size": chunk_size,
                 "chunk_overlap": chunk_overlap,
+                "content_hash": content_hash,
                 "status": "ready",
                 "created_at": firestore.SERVER_TIMESTAMP,
                 "updated_at": firestore.SERVER_TIMESTAMP
@@ -192,6 +232,8 @@ Answer:""",
         except Exception as e:
             error_msg = str(e)
             print(f"[Error processing doc {document_id}]: {error_msg}")
+            # A failed document must not be reused for later uploads of the same file
+            self._uploads_by_hash.pop((user_id, content_hash), None)
             
             # Update Firestore with error
             doc_ref = self.db.collection("documents").document(document_id)
@@ -201,17 +243,50 @@ Answer:""",
                 "updated_at": firestore.SERVER_TIMESTAMP
             })
         finally:
-            self.processing_status[store_key] = False
+            self.processing_status.pop(store_key, None)
             if os.path.exists(file_path):
                 try:
                     os.remove(file_path)
                 except Exception as e:
                     print(f"[Warning] Could not delete temp file {file_path}: {e}")
     
-    def upload_document(
+    async def _save_upload(self, file: UploadFile, file_location: str) -> str:
+        """
+        Stream an uploaded file to disk in fixed-size chunks, hashing it on the way.
+        
+        Args:
+            file: Uploaded file
+            file_location: Destination path
+            
+        Returns:
+            Hex digest of the file content
+            
+        Raises:
+            HTTPException: If the file is empty or exceeds the upload size limit
+        """
+        total_bytes = 0
+        content_hash = hashlib.blake2b(digest_size=16)
+        async with aiofiles.open(file_location, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                total_bytes += len(chunk)
+                if total_bytes > settings.max_upload_size:
+                    break
+                content_hash.update(chunk)
+                await f.write(chunk)
+        
+        if total_bytes > settings.max_upload_size or total_bytes == 0:
+            os.remove(file_location)
+            if total_bytes == 0:
+                raise HTTPException(status_code=400, detail="Empty file uploaded")
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Max size: {settings.max_upload_size / 1024 / 1024}MB"
+            )
+        return content_hash.hexdigest()
+    
+    async def upload_document(
         self,
-        file_content: bytes,
-        filename: str,
+        file: UploadFile,
         user_id: str,
         background_tasks: BackgroundTasks
     ) -> dict:
@@ -219,8 +294,7 @@ Answer:""",
         Upload and process document with user_id from token.
         
         Args:
-            file_content: File content bytes
-            filename: Original filename
+            file: Uploaded document file
             user_id: User ID from Firebase token (never from request)
             background_tasks: FastAPI background tasks
             
@@ -230,37 +304,46 @@ Answer:""",
         Raises:
             HTTPException: If file is invalid
         """
+        filename = file.filename
         if not filename:
             raise HTTPException(status_code=400, detail="No file provided")
         
-        file_extension = Path(filename).suffix.lower()
+        file_extension = os.path.splitext(filename)[1].lower()
         if file_extension not in self.supported_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type. Supported types are: {', '.join(self.supported_extensions.keys())}"
-            )
-        
-        if not file_content:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
-        
-        if len(file_content) > settings.max_upload_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Max size: {settings.max_upload_size / 1024 / 1024}MB"
-            )
-        
-        # Enforce free tier limits
-        usage_limit_service.check_document_limit(user_id)
+            raise HTTPException(status_code=400, detail=UNSUPPORTED_TYPE_MESSAGE)
         
         document_id = str(uuid.uuid4())
         store_key = f"{user_id}_{document_id}"
-        self.processing_status[store_key] = True
         
-        os.makedirs(self.temp_dir, exist_ok=True)
         file_location = os.path.join(self.temp_dir, f"{document_id}_{filename}")
+        content_hash = await self._save_upload(file, file_location)
+        
+        # Same bytes already uploaded by this user: reuse that document instead of re-embedding.
+        # Lookup and registration happen with no await in between, so concurrent uploads
+        # can't both miss; the registration is rolled back if the limit check fails.
+        existing_id = self._uploads_by_hash.get((user_id, content_hash))
+        if existing_id:
+            os.remove(file_location)
+            is_processing = self.processing_status.get(f"{user_id}_{existing_id}", False)
+            return {
+                "message": "File already uploaded. Reusing the existing document.",
+                "task_id": existing_id,
+                "document_id": existing_id,
+                "status": "processing" if is_processing else "ready"
+            }
         
-        with open(file_location, "wb") as f:
-            f.write(file_content)
+        self._uploads_by_hash[(user_id, content_hash)] = document_id
+        self.processing_status[store_key] = True
+        
+        # Enforce free tier limits
+        try:
+            # Sync Firestore query; keep it off the event loop
+            await run_in_threadpool(usage_limit_service.check_document_limit, user_id)
+        except HTTPException:
+            self._uploads_by_hash.pop((user_id, content_hash), None)
+            self.processing_status.pop(store_key, None)
+            os.remove(file_location)
+            raise
         
         # Create initial Firestore document
         doc_ref = self.db.collection("documents").document(document_id)
@@ -268,6 +351,7 @@ Answer:""",
             "document_id": document_id,
             "user_id": user_id,
             "filename": filename,
+            "content_hash": content_hash,
             "status": "processing",
             "created_at": firestore.SERVER_TIMESTAMP
         })
@@ -277,7 +361,8 @@ Answer:""",
             document_id,
             user_id,
             filename,
-            file_location
+            file_location,
+            content_hash
         )
         
         return {
@@ -316,8 +401,11 @@ Answer:""",
         if doc_data.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Not authorized to access this document")
         
-        # Check if vectorstore exists
-        is_ready = store_key in self.vectorstores and not self.processing_status.get(store_key, False)
+        # Check if vectorstore exists (cached or persisted)
+        is_ready = not self.processing_status.get(store_key, False) and (
+            self._get_cached_vectorstore(store_key) is not None
+            or os.path.isdir(self._vectorstore_path(store_key))
+        )
         
         return {
             "processing": self.processing_status.get(store_key, False),
@@ -328,7 +416,16 @@ Answer:""",
             "error": doc_data.get("error_message")
         }
     
-    def call_gemini_llm(self, prompt: str, api_key: Optional[str] = None) -> str:
+    def _gemini_headers(self, api_key: Optional[str]) -> dict:
+        """Get Gemini request headers, reusing the prebuilt ones for the server key."""
+        if not api_key:
+            return self.default_headers
+        return {
+            "x-goog-api-key": api_key,
+            "Content-Type": "application/json"
+        }
+    
+    async def call_gemini_llm(self, prompt: str, api_key: Optional[str] = None) -> str:
         """
         Call Gemini API for LLM response.
         
@@ -339,11 +436,7 @@ Answer:""",
         Returns:
             LLM response text
         """
-        key = api_key or self.api_key
-        headers = {
-            "x-goog-api-key": key,
-            "Content-Type": "application/json"
-        }
+        headers = self._gemini_headers(api_key)
         json_body = {
             "contents": [
                 {"parts": [{"text": prompt}]}
@@ -351,29 +444,63 @@ Answer:""",
         }
         
         try:
-            response = requests.post(
-                f"{self.api_url}/{self.model}:generateContent",
+            # Shared pooled client: keep-alive connections, no per-question TLS handshake
+            response = await http_client.post(
+                self.generate_url,
                 headers=headers,
-                json=json_body,
+                content=orjson.dumps(json_body),
                 timeout=30
             )
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             return data["candidates"][0]["content"]["parts"][0]["text"]
         except Exception as e:
             print("Gemini LLM error:", e)
             return "Error: Could not get response from Gemini"
     
-    def ask_question(
+    async def stream_gemini_llm(self, prompt: str, api_key: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream Gemini response text as it is generated (streamGenerateContent over SSE).
+        
+        Args:
+            prompt: Input prompt
+            api_key: Optional Gemini API key (user's key or settings)
+            
+        Yields:
+            LLM response text chunks
+        """
+        headers = self._gemini_headers(api_key)
+        json_body = {
+            "contents": [
+                {"parts": [{"text": prompt}]}
+            ]
+        }
+        
+        try:
+            async for text in stream_gemini_text(
+                self.stream_url,
+                headers=headers,
+                content=orjson.dumps(json_body),
+                timeout=30
+            ):
+                yield text
+        except httpx.HTTPStatusError as e:
+            print("Gemini LLM error:", e.response.status_code, e.response.text)
+            yield "Error: Could not get response from Gemini"
+        except httpx.RequestError as e:
+            print("Gemini LLM error:", e)
+            yield "Error: Could not get response from Gemini"
+    
+    async def _prepare_question(
         self,
         question: str,
         document_id: str,
         user_id: str,
-        use_mmr: bool = True,
-        k: int = 5
+        use_mmr: bool,
+        k: int
     ) -> dict:
         """
-        Ask question about uploaded document using advanced RAG retrieval.
+        Retrieve context for a question and build the LLM prompt.
         
         Args:
             question: User question
@@ -383,7 +510,8 @@ Answer:""",
             k: Number of chunks to retrieve
             
         Returns:
-            Question and answer response with source documents
+            Dictionary with docs, context and prompt; "answer" is set instead of
+            "prompt" when no LLM call is needed (greetings, nothing retrieved)
             
         Raises:
             HTTPException: If document is still processing or invalid
@@ -398,7 +526,7 @@ Answer:""",
             )
         
         # Get vectorstore
-        vector_store = self.vectorstores.get(store_key)
+        vector_store = self._get_cached_vectorstore(store_key)
         if not vector_store:
             # Verify document exists and belongs to user
             doc_ref = self.db.collection("documents").document(document_id)
@@ -408,18 +536,18 @@ Answer:""",
             doc_data = doc.to_dict()
             if doc_data.get("user_id") != user_id:
                 raise HTTPException(status_code=403, detail="Not authorized to access this document")
-            raise HTTPException(status_code=404, detail="Document vectorstore not found. Processing may have failed.")
+            
+            # Evicted, expired or processed before a restart: reload from disk
+            embeddings = get_gemini_embeddings(await auth_service.get_gemini_api_key_async(user_id))
+            vector_store = await run_in_threadpool(self._load_vectorstore, store_key, embeddings)
+            if not vector_store:
+                raise HTTPException(status_code=404, detail="Document vectorstore not found. Processing may have failed.")
         
         # Handle greetings separately (don't use RAG for simple greetings)
         question_lower = question.strip().lower()
         greeting_keywords = ["hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening"]
         if question_lower in greeting_keywords or any(question_lower.startswith(g) for g in greeting_keywords):
-            return {
-                "question": question,
-                "answer": "Hello! I'm your Document Assistant. How can I assist you with the uploaded files today?",
-                "chunks_used": 0,
-                "source_documents": []
-            }
+            return {"answer": GREETING_ANSWER, "docs": []}
         
         # Detect analysis/evaluation questions (like "is this good", "how is", "what do you think")
         analysis_keywords = ["is this", "how is", "what do you think", "evaluate", "analyze", "review", "assess", "rate", "opinion"]
@@ -428,36 +556,27 @@ Answer:""",
         # For analysis questions, retrieve more chunks to get broader context
         retrieval_k = k * 2 if is_analysis_question else k
         
-        # Use advanced retrieval (MMR or similarity)
+        # Use advanced retrieval (MMR or similarity); the query is embedded over the shared
+        # async client and searching one document's index is cheap enough for the event loop
         if use_mmr:
-            docs = vector_store.max_marginal_relevance_search(
+            docs = await vector_store.amax_marginal_relevance_search(
                 question,
                 k=retrieval_k,
                 fetch_k=retrieval_k * 4,
                 lambda_mult=0.5
             )
         else:
-            docs = vector_store.similarity_search(question, k=retrieval_k)
+            docs = await vector_store.asimilarity_search(question, k=retrieval_k)
         
         if not docs:
-            return {
-                "question": question,
-                "answer": "I couldn't find any relevant information in the documents to answer this question.",
-                "chunks_used": 0,
-                "source_documents": []
-            }
+            return {"answer": NO_CONTEXT_ANSWER, "docs": []}
         
         # Format context
         context = "\n\n".join([doc.page_content for doc in docs])
         
         # Ensure context is not empty
         if not context or not context.strip():
-            return {
-                "question": question,
-                "answer": "I couldn't find any relevant information in the documents to answer this question.",
-                "chunks_used": 0,
-                "source_documents": []
-            }
+            return {"answer": NO_CONTEXT_ANSWER, "docs": []}
         
         # Use different prompt for analysis questions
         if is_analysis_question:
@@ -475,25 +594,12 @@ Answer:"""
             prompt = analysis_prompt
         else:
             # Format prompt using template for factual questions
-            prompt = self.qa_prompt.format(context=context, question=question)
-        
-        # Call LLM (user's API key if set)
-        user_api_key = auth_service.get_gemini_api_key(user_id)
-        answer = self.call_gemini_llm(prompt, api_key=user_api_key)
-        
-        # Ensure answer is not just the greeting (fallback check)
-        if answer.strip().lower().startswith("hello! i'm your document assistant"):
-            # If LLM still returned greeting for non-greeting question, try again with more explicit prompt
-            explicit_prompt = f"""Answer the following question using ONLY the provided context. Do NOT respond with greetings.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer the question directly:"""
-            answer = self.call_gemini_llm(explicit_prompt, api_key=user_api_key)
+            prompt = QA_PROMPT_TEMPLATE.format(context=context, question=question)
         
+        return {"docs": docs, "context": context, "prompt": prompt}
+    
+    def _build_answer_response(self, question: str, answer: str, docs: list[Document]) -> dict:
+        """Build the question/answer response with source document previews."""
         return {
             "question": question,
             "answer": answer,
@@ -510,6 +616,102 @@ Answer the question directly:"""
             ]
         }
     
+    async def ask_question(
+        self,
+        question: str,
+        document_id: str,
+        user_id: str,
+        use_mmr: bool = True,
+        k: int = 5
+    ) -> dict:
+        """
+        Ask question about uploaded document using advanced RAG retrieval.
+        
+        Args:
+            question: User question
+            document_id: Document identifier
+            user_id: User ID from token (for verification)
+            use_mmr: Use Max Marginal Relevance retrieval
+            k: Number of chunks to retrieve
+            
+        Returns:
+            Question and answer response with source documents
+            
+        Raises:
+            HTTPException: If document is still processing or invalid
+        """
+        prepared = await self._prepare_question(question, document_id, user_id, use_mmr, k)
+        if "answer" in prepared:
+            return self._build_answer_response(question, prepared["answer"], prepared["docs"])
+        
+        context = prepared["context"]
+        
+        # Call LLM (user's API key if set)
+        user_api_key = await auth_service.get_gemini_api_key_async(user_id)
+        answer = await self.call_gemini_llm(prepared["prompt"], api_key=user_api_key)
+        
+        # Ensure answer is not just the greeting (fallback check)
+        if answer.strip().lower().startswith("hello! i'm your document assistant"):
+            # If LLM still returned greeting for non-greeting question, try again with more explicit prompt
+            explicit_prompt = f"""Answer the following question using ONLY the provided context. Do NOT respond with greetings.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer the question directly:"""
+            answer = await self.call_gemini_llm(explicit_prompt, api_key=user_api_key)
+        
+        return self._build_answer_response(question, answer, prepared["docs"])
+    
+    async def stream_question(
+        self,
+        question: str,
+        document_id: str,
+        user_id: str,
+        use_mmr: bool = True,
+        k: int = 5
+    ) -> AsyncIterator[bytes]:
+        """
+        Ask question about uploaded document and stream the answer as server-sent events.
+        
+        Retrieval runs before this returns, so processing/ownership errors surface
+        as normal HTTP errors rather than mid-stream.
+        
+        Args:
+            question: User question
+            document_id: Document identifier
+            user_id: User ID from token (for verification)
+            use_mmr: Use Max Marginal Relevance retrieval
+            k: Number of chunks to retrieve
+            
+        Returns:
+            Async iterator of SSE events: text chunks, then a final event with
+            done=true and the full question/answer response
+            
+        Raises:
+            HTTPException: If document is still processing or invalid
+        """
+        prepared = await self._prepare_question(question, document_id, user_id, use_mmr, k)
+        user_api_key = None if "answer" in prepared else await auth_service.get_gemini_api_key_async(user_id)
+        return self._stream_answer(question, prepared, user_api_key)
+    
+    async def _stream_answer(self, question: str, prepared: dict, api_key: Optional[str]) -> AsyncIterator[bytes]:
+        """Forward Gemini chunks as SSE events, then send the full response."""
+        if "answer" in prepared:
+            answer = prepared["answer"]
+            yield sse_event({"text": answer})
+        else:
+            parts = []
+            async for text in self.stream_gemini_llm(prepared["prompt"], api_key=api_key):
+                parts.append(text)
+                yield sse_event({"text": text})
+            answer = "".join(parts)
+        
+        done_event = {"done": True, **self._build_answer_response(question, answer, prepared["docs"])}
+        yield sse_event(done_event)
+    
     def delete_document(self, document_id: str, user_id: str) -> dict:
         """
         Delete document and its vectorstore.
@@ -542,14 +744,61 @@ Answer the question directly:"""
         # Delete from Firestore
         doc_ref.delete()
         
-        # Delete from RAM (vectorstore)
-        self.vectorstores.pop(store_key, None)
+        # Delete vectorstore from RAM and disk
+        with self._vectorstores_lock:
+            self.vectorstores.pop(store_key, None)
         self.processing_status.pop(store_key, None)
+        self._uploads_by_hash.pop((user_id, doc_data.get("content_hash")), None)
+        shutil.rmtree(self._vectorstore_path(store_key), ignore_errors=True)
         
         return {
             "message": "Document deleted successfully",
             "document_id": document_id
         }
+    
+    async def cleanup_orphaned_vectorstores(self, user_id: str) -> dict:
+        """
+        Remove a user's persisted vectorstores whose Firestore document no longer exists.
+        
+        Args:
+            user_id: User ID from token (only this user's vectorstores are checked)
+            
+        Returns:
+            Cleanup summary with the removed document IDs
+        """
+        prefix = f"{user_id}_"
+        try:
+            # Only per-document directories; legacy flat <store_key>.faiss/.pkl files are not vectorstores here
+            store_keys = [
+                name for name in os.listdir(self.vectorstores_dir)
+                if name.startswith(prefix) and os.path.isdir(self._vectorstore_path(name))
+            ]
+        except FileNotFoundError:
+            store_keys = []
+        
+        removed = []
+        if store_keys:
+            document_ids = {store_key: store_key[len(prefix):] for store_key in store_keys}
+            refs = [self.async_db.collection("documents").document(doc_id) for doc_id in document_ids.values()]
+            # One BatchGet for all of the user's vectorstores
+            existing = {snap.id async for snap in self.async_db.get_all(refs) if snap.exists}
+            
+            for store_key, document_id in document_ids.items():
+                if document_id in existing or self.processing_status.get(store_key):
+                    continue
+                with self._vectorstores_lock:
+                    self.vectorstores.pop(store_key, None)
+                try:
+                    await run_in_threadpool(shutil.rmtree, self._vectorstore_path(store_key))
+                except OSError as e:
+                    print(f"Error removing vectorstore {store_key}: {e}")
+                    continue
+                removed.append(document_id)
+        
+        return {
+            "message": f"Removed {len(removed)} orphaned vectorstore(s)",
+            "removed": removed
+        }
 
 
 # Singleton instance
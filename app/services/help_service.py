@@ -1,4 +1,5 @@
 """Service for managing help queries and support tickets."""
+import datetime
 import uuid
 from typing import List, Optional
 from firebase_admin import firestore
@@ -31,7 +32,6 @@ class HelpService:
         self.db.collection(self.collection_name).document(query_id).set(db_data)
         
         # Return serializable data (SERVER_TIMESTAMP is not JSON serializable)
-        import datetime
         response_data = db_data.copy()
         now_iso = datetime.datetime.now().isoformat()
         response_data["created_at"] = now_iso
@@ -29,6 +29,11 @@ class PDFService:
         
         # Track if browsers are installed
         self._browsers_installed = False
+        
+        # One Chromium per worker, launched on first use instead of once per PDF
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = asyncio.Lock()
     
     def _validate_template_id(self, template_id: str):
         """Validate template ID."""
@@ -130,6 +135,29 @@ class PDFService:
             detail="Playwright browser not installed. Add 'playwright install chromium' to your build process."
         )
     
+    async def _get_browser(self):
+        """Get the shared Chromium browser, launching it if needed (or after a crash)."""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        
+        async with self._browser_lock:
+            if self._browser is None or not self._browser.is_connected():
+                # Ensure browsers are installed before the first launch
+                self._ensure_browsers_installed()
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+        return self._browser
+    
+    async def close(self) -> None:
+        """Close the shared browser on application shutdown."""
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+    
     async def _html_to_pdf(self, html: str) -> bytes:
         """
         Convert HTML to PDF using Playwright.
@@ -143,20 +171,18 @@ class PDFService:
         Raises:
             HTTPException: If PDF generation fails
         """
-        # Ensure browsers are installed before attempting PDF generation
-        self._ensure_browsers_installed()
-        
         try:
-            async with async_playwright() as p:
-                # Launch browser
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
+            browser = await self._get_browser()
+            # A fresh context per PDF keeps requests isolated on the shared browser
+            context = await browser.new_context()
+            try:
+                page = await context.new_page()
                 
                 # Set content
                 await page.set_content(html, wait_until="networkidle")
                 
                 # Generate PDF with A4 settings
-                pdf_bytes = await page.pdf(
+                return await page.pdf(
                     format="A4",
                     margin={
                         "top": "0mm",
@@ -167,10 +193,8 @@ class PDFService:
                     print_background=True,
                     prefer_css_page_size=True
                 )
-                
-                await browser.close()
-                
-                return pdf_bytes
+            finally:
+                await context.close()
         except HTTPException:
             raise
         except Exception as e:
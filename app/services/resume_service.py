@@ -1,124 +1,151 @@
 """Resume analysis and generation service."""
 import os
-import json
-import re
-from pathlib import Path
+import asyncio
+import hashlib
+import threading
+import time
+from collections import defaultdict, deque
+from itertools import repeat
+import fitz  # PyMuPDF
+import httpx
+from cachetools import TTLCache
 from fastapi import HTTPException
-from langchain_community.document_loaders import PyPDFLoader
-import requests
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from typing import AsyncIterator, Awaitable, Callable, Optional
+import orjson
 from app.config import settings
+from app.core.document_loading import extract_pdf_text, get_process_pool
+from app.core.http_client import http_client
+from app.core.streaming import sse_event, stream_gemini_text
 from app.services.usage_limit_service import usage_limit_service
 from app.services.auth_service import auth_service
 
 
-class ResumeService:
-    """Service for resume analysis and generation."""
-    
-    def __init__(self):
-        self.api_key = settings.gemini_api_key
-        self.model = settings.gemini_model
-        self.api_url = settings.gemini_api_url
-        self.temp_dir = settings.temp_resumes_dir
-    
-    def extract_resume_text(self, file_path: str) -> str:
-        """
-        Extract text from PDF resume.
-        
-        Args:
-            file_path: Path to PDF file
-            
-        Returns:
-            Extracted resume text
-            
-        Raises:
-            HTTPException: If PDF cannot be loaded or is empty
-        """
-        try:
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
-        except Exception as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Error loading PDF: {str(e)}"
-            )
-        
-        if not documents:
-            raise HTTPException(
-                status_code=400,
-                detail="No content could be extracted from the resume"
-            )
-        
-        resume_text = ""
-        for doc in documents:
-            resume_text += doc.page_content + "\n"
-        
-        return resume_text
-    
-    def call_gemini_api(self, prompt: str, timeout: int = 60, api_key: Optional[str] = None) -> str:
-        """
-        Call Gemini API with prompt.
-        
-        Args:
-            prompt: Input prompt
-            timeout: Request timeout in seconds
-            api_key: Optional Gemini API key (user's key or settings)
-            
-        Returns:
-            API response text
-            
-        Raises:
-            HTTPException: If API call fails
-        """
-        key = api_key or self.api_key
-        headers = {
-            "x-goog-api-key": key,
-            "Content-Type": "application/json"
-        }
-        json_body = {
-            "contents": [
-                {"parts": [{"text": prompt}]}
-            ]
-        }
-        
-        response = requests.post(
-            f"{self.api_url}/{self.model}:generateContent",
-            headers=headers,
-            json=json_body,
-            timeout=timeout
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error from AI service: {response.text}"
-            )
-        
-        ai_response = response.json()
-        try:
-            return ai_response["candidates"][0]["content"]["parts"][0]["text"]
-        except Exception:
-            raise HTTPException(
-                status_code=500,
-                detail="Unexpected Gemini API response format"
-            )
+# Below this many pages, process pool hand-off costs more than serial extraction saves
+PARALLEL_EXTRACTION_MIN_PAGES = 20
+
+# Gemini responses worth retrying: rate limiting and transient server/gateway errors
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+RETRY_BACKOFF_SECONDS = 0.5
+# Fail fast on an unreachable API instead of waiting out the whole generation timeout
+GEMINI_CONNECT_TIMEOUT = 10
+
+# Read timeouts adapt to 2x the recent p95 latency of the same model and output budget
+LATENCY_WINDOW = 100
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+ADAPTIVE_TIMEOUT_FLOOR = 15
+
+
+def _clip(text: str, max_chars: int) -> str:
+    """
+    Clip text to roughly max_chars for a prompt, keeping the head and tail.
     
-    def analyze_resume(self, resume_text: str, job_description: str, user_id: str) -> dict:
-        """
-        Analyze resume against job description.
-        
-        Args:
-            resume_text: Extracted resume text
-            job_description: Job description text
-            user_id: User ID for usage limits
-            
-        Returns:
-            Analysis result dictionary
-        """
-        # Check usage limit
-        usage_limit_service.check_resume_limit(user_id)
-        
-        analysis_prompt = f"""
+    Resumes open with the summary and usually end with skills, so the middle is dropped.
+    """
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars * 3 // 4] + "\n...\n" + text[-(max_chars // 4):]
+
+
+def _object(**properties: dict) -> dict:
+    """Gemini response schema for an object whose properties are all required, in order."""
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": list(properties),
+        "propertyOrdering": list(properties)
+    }
+
+
+def _array(items: dict) -> dict:
+    """Gemini response schema for an array."""
+    return {"type": "ARRAY", "items": items}
+
+
+_STRING = {"type": "STRING"}
+_STRINGS = _array(_STRING)
+
+# Gemini JSON mode schemas: output is guaranteed to parse and to have these shapes
+ANALYSIS_SCHEMA = _object(
+    resumeScore={"type": "NUMBER"},
+    jobMatchScore={"type": "NUMBER"},
+    strengths=_STRINGS,
+    improvements=_STRINGS,
+    recommendations=_STRINGS,
+    missingKeywords=_STRINGS,
+    recommendedKeywords=_STRINGS
+)
+
+BATCH_ANALYSIS_SCHEMA = _array(ANALYSIS_SCHEMA)
+
+JD_RESUME_SCHEMA = _object(
+    basics=_object(
+        full_name=_STRING,
+        title=_STRING,
+        location=_object(city=_STRING, region=_STRING, country=_STRING),
+        contact=_object(email=_STRING, phone=_STRING, linkedin=_STRING, github=_STRING, portfolio=_STRING)
+    ),
+    summary=_object(headline=_STRING, highlights=_STRINGS),
+    experience=_array(_object(
+        company=_STRING,
+        role=_STRING,
+        location=_STRING,
+        employment_type=_STRING,
+        start_date=_STRING,
+        end_date={"type": "STRING", "nullable": True},
+        is_current={"type": "BOOLEAN"},
+        summary=_STRING,
+        highlights=_STRINGS,
+        tech_stack=_STRINGS
+    )),
+    projects=_array(_object(
+        name=_STRING,
+        type=_STRING,
+        link=_STRING,
+        description=_STRING,
+        highlights=_STRINGS,
+        tech_stack=_STRINGS
+    )),
+    education=_array(_object(
+        institution=_STRING,
+        degree=_STRING,
+        location=_STRING,
+        start_date=_STRING,
+        end_date=_STRING,
+        gpa=_STRING,
+        highlights=_STRINGS
+    )),
+    skills=_object(categories=_array(_object(name=_STRING, items=_STRINGS))),
+    certifications=_STRINGS,
+    achievements=_STRINGS,
+    metadata=_object(target_role=_STRING, experience_level=_STRING, resume_version=_STRING)
+)
+
+RESUME_SCHEMA = _object(
+    name=_STRING,
+    contact=_object(phone=_STRING, email=_STRING, location=_STRING),
+    summary=_STRING,
+    experience=_array(_object(
+        role=_STRING,
+        company=_STRING,
+        location=_STRING,
+        duration=_STRING,
+        details=_STRINGS
+    )),
+    projects=_array(_object(title=_STRING, link=_STRING, details=_STRINGS)),
+    education=_array(_object(degree=_STRING, university=_STRING, duration=_STRING, cgpa=_STRING)),
+    skills=_object(
+        frontend=_STRINGS,
+        backend=_STRINGS,
+        database=_STRINGS,
+        tools=_STRINGS,
+        soft_skills=_STRINGS
+    )
+)
+
+
+# Prompts are built once at import; only the resume/JD text is substituted per request
+ANALYSIS_PROMPT_TEMPLATE = """
             You are a world-class resume analysis and career optimization expert.
 
             Take your time to thoroughly analyze the candidate's resume and compare it with the provided job description.
@@ -159,41 +186,38 @@ class ResumeService:
             ### Job Description:
             {job_description}
             """
-        
-        user_api_key = auth_service.get_gemini_api_key(user_id)
-        analysis_result = self.call_gemini_api(analysis_prompt, timeout=60, api_key=user_api_key)
-        cleaned_result = re.sub(r"^```(json)?|```$", "", analysis_result, flags=re.IGNORECASE).strip()
-        
-        # Increment usage count
-        usage_limit_service.increment_resume_count(user_id)
-        
-        return {
-            "analysis": cleaned_result,
-            "resume_text": resume_text,
-            "job_description": job_description
-        }
-    
-    def generate_resume(self, resume_type: str, resume_text: str, user_id: str, job_description: str = "") -> dict:
-        """
-        Generate/formatted resume JSON.
-        
-        Args:
-            resume_type: Type of resume generation ("jd_resume" or other)
-            resume_text: Original resume text
-            user_id: User ID for usage limits
-            job_description: Job description (for JD-tailored resumes)
-            
-        Returns:
-            Generated resume JSON structure
-            
-        Raises:
-            HTTPException: If generation fails
-        """
-        # Check usage limit
-        usage_limit_service.check_resume_limit(user_id)
-        
-        if resume_type == "jd_resume":
-            resume_prompt = f"""
+
+BATCH_ANALYSIS_PROMPT_TEMPLATE = """
+            You are a world-class resume analysis and career optimization expert.
+
+            Below is one job description followed by {resume_count} numbered candidate resumes. Analyze each resume against the job description on its own merits — do not compare candidates with each other, and do not skip or shorten any part of any analysis.
+
+            ---
+
+            ### For each resume provide:
+
+            1. **Resume Score** (out of 100) — evaluate structure, clarity, formatting, grammar, and overall presentation.
+            2. **Job Match Score** (out of 100) — evaluate how well the resume aligns with the job description.
+            3. **Top 3–5 Strengths** — list strong areas relevant to the job.
+            4. **Top 3–5 Areas for Improvement** — specific, actionable areas where the resume can improve.
+            5. **3–5 Actionable Recommendations** — changes to improve matching, structure, or clarity.
+            6. **Missing Keywords** — keywords from the JD not found in the resume.
+            7. **Recommended Keywords to Add** — job-specific keywords that should be added.
+            ---
+
+            ### Respond with a JSON array holding exactly {resume_count} analyses, in resume order (Resume 1 first).
+
+            ---
+
+            ### Job Description:
+            {job_description}
+
+            ---
+
+            {resumes}
+            """
+
+JD_RESUME_PROMPT_TEMPLATE = """
         You are a world-class resume builder and ATS optimization engine used by platforms like Rezi, Kickresume, and Novoresume.
 
         Your task is to extract, normalize, and restructure the candidate’s resume into a **clean, professional, design-agnostic JSON format**, optimized for the given job description.
@@ -336,8 +360,7 @@ class ResumeService:
         {job_description}
     """
 
-        else:
-            resume_prompt = f"""
+RESUME_PROMPT_TEMPLATE = """
         You are an elite resume formatting and grammar expert used by resume apps like Novoresume and Zety.
 
         Your task is to extract and structure the candidate's resume data into a clean JSON format, improving clarity and organization — **without changing or fabricating content**.
@@ -406,22 +429,751 @@ class ResumeService:
         ### Original Resume:
         {resume_text}
         """
+
+
+class ResumeService:
+    """Service for resume analysis and generation."""
+    
+    def __init__(self):
+        self.api_key = settings.gemini_api_key
+        self.model = settings.gemini_model
+        self.api_url = settings.gemini_api_url
+        self.generate_url = f"{self.api_url}/{self.model}:generateContent"
+        self.stream_url = f"{self.api_url}/{self.model}:streamGenerateContent"
+        self.default_headers = {
+            "x-goog-api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
+        
+        # (resume hash, job description hash) -> analysis result, so re-runs skip parsing and Gemini
+        self.analyses: TTLCache = TTLCache(
+            maxsize=settings.resume_analysis_cache_size,
+            ttl=settings.resume_analysis_cache_ttl
+        )
+        self._analyses_lock = threading.Lock()
+        # (resume hash, max pages) -> extracted text, so the same resume against new JDs skips parsing
+        self.resume_texts: TTLCache = TTLCache(
+            maxsize=settings.resume_text_cache_size,
+            ttl=settings.resume_analysis_cache_ttl
+        )
+        self._resume_texts_lock = threading.Lock()
+        # Prompt hash -> generated resume, so repeated "generate" clicks skip Gemini
+        self.generated_resumes: TTLCache = TTLCache(
+            maxsize=settings.resume_generation_cache_size,
+            ttl=settings.resume_generation_cache_ttl
+        )
+        self._generated_resumes_lock = threading.Lock()
+        # Cache key -> result future of the Gemini call currently producing it (event loop only)
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        # (model, max output tokens) -> recent successful generateContent latencies in seconds
+        self._latencies: defaultdict[tuple, deque] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+    
+    def extract_resume_text(self, content: bytes, max_pages: Optional[int] = None) -> str:
+        """
+        Extract text from PDF resume.
+        
+        Args:
+            content: PDF file bytes
+            max_pages: Optional number of leading pages to extract (all pages if None)
+            
+        Returns:
+            Extracted resume text
+            
+        Raises:
+            HTTPException: If PDF cannot be loaded, is empty or has too many pages
+        """
+        try:
+            # MuPDF's C text extraction is much faster than pypdf's pure-Python parser
+            pdf = fitz.open(stream=content, filetype="pdf")
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Error loading PDF: {str(e)}"
+            )
+        
+        with pdf:
+            if pdf.page_count == 0:
+                raise HTTPException(
+                    status_code=400,
+                    detail="No content could be extracted from the resume"
+                )
+            
+            # Checked against the whole document, before max_pages narrows what is read
+            if pdf.page_count > settings.resume_max_pages:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Resume PDF has too many pages. Max pages: {settings.resume_max_pages}"
+                )
+            
+            page_count = pdf.page_count if max_pages is None else min(pdf.page_count, max_pages)
+            if page_count <= PARALLEL_EXTRACTION_MIN_PAGES:
+                return "\n".join(pdf.load_page(i).get_text("text") for i in range(page_count)) + "\n"
+        
+        # Long CVs: extract page ranges in the loading process pool, one range per worker
+        workers = os.cpu_count() or 1
+        step = -(-page_count // workers)
+        starts = range(0, page_count, step)
+        stops = [min(start + step, page_count) for start in starts]
+        return "".join(get_process_pool().map(extract_pdf_text, repeat(content), starts, stops))
+    
+    def _model_url(self, model: Optional[str], method: str) -> str:
+        """Get the Gemini endpoint URL for a model method."""
+        if model is None or model == self.model:
+            return self.generate_url if method == "generateContent" else self.stream_url
+        return f"{self.api_url}/{model}:{method}"
+    
+    def _build_gemini_request(
+        self,
+        prompt: str,
+        api_key: Optional[str],
+        response_schema: Optional[dict],
+        max_output_tokens: Optional[int]
+    ) -> tuple[dict, dict]:
+        """Build Gemini request headers and JSON body."""
+        if api_key:
+            headers = {
+                "x-goog-api-key": api_key,
+                "Content-Type": "application/json"
+            }
+        else:
+            headers = self.default_headers
+        json_body = {
+            "contents": [
+                {"parts": [{"text": prompt}]}
+            ]
+        }
+        generation_config = {}
+        if response_schema is not None:
+            generation_config["responseMimeType"] = "application/json"
+            generation_config["responseSchema"] = response_schema
+        if max_output_tokens is not None:
+            generation_config["maxOutputTokens"] = max_output_tokens
+        if generation_config:
+            json_body["generationConfig"] = generation_config
+        return headers, json_body
+    
+    async def call_gemini_api(
+        self,
+        prompt: str,
+        timeout: int = 60,
+        api_key: Optional[str] = None,
+        response_schema: Optional[dict] = None,
+        max_output_tokens: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> str:
+        """
+        Call Gemini API with prompt.
+        
+        Args:
+            prompt: Input prompt
+            timeout: Request timeout in seconds
+            api_key: Optional Gemini API key (user's key or settings)
+            response_schema: Optional JSON schema; when set, Gemini returns JSON of this shape
+            max_output_tokens: Optional cap on generated tokens (thinking included)
+            model: Optional model name (defaults to settings.gemini_model)
+            
+        Returns:
+            API response text
+            
+        Raises:
+            HTTPException: If API call fails
+        """
+        headers, json_body = self._build_gemini_request(prompt, api_key, response_schema, max_output_tokens)
+        body = orjson.dumps(json_body)
+        model = model or self.model
+        profile = (model, max_output_tokens)
+        
+        try:
+            return await self._generate(profile, headers, body, self._adaptive_timeout(profile, timeout))
+        except httpx.ReadTimeout as e:
+            fallback_model = settings.gemini_fallback_model
+            if not fallback_model or fallback_model == model:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"AI service unavailable: {str(e) or 'timed out'}"
+                )
+            print(f"Gemini {model} timed out; retrying on {fallback_model}")
+        
+        try:
+            return await self._generate((fallback_model, max_output_tokens), headers, body, timeout)
+        except httpx.ReadTimeout as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"AI service unavailable: {str(e) or 'timed out'}"
+            )
+    
+    def _adaptive_timeout(self, profile: tuple, timeout: float) -> float:
+        """
+        Get the read timeout for a call profile: twice its recent p95 latency, within [floor, timeout].
+        
+        Until enough calls have been observed the caller's timeout is used unchanged.
+        """
+        latencies = self._latencies.get(profile)
+        if latencies is None or len(latencies) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return timeout
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+        return min(timeout, max(ADAPTIVE_TIMEOUT_FLOOR, 2 * p95))
+    
+    async def _generate(self, profile: tuple, headers: dict, body: bytes, timeout: float) -> str:
+        """
+        Send a generateContent request, retrying transient failures, and record its latency.
+        
+        Args:
+            profile: (model, max output tokens) the latency is tracked under
+            headers: Request headers
+            body: Encoded request body
+            timeout: Read timeout in seconds
+            
+        Returns:
+            API response text
+            
+        Raises:
+            httpx.ReadTimeout: If no response arrived within timeout (callers may fail over)
+            HTTPException: If API call fails otherwise
+        """
+        model = profile[0]
+        for attempt in range(settings.gemini_max_retries + 1):
+            retries_left = attempt < settings.gemini_max_retries
+            started = time.monotonic()
+            try:
+                # Shared pooled client; the event loop keeps serving other requests meanwhile
+                response = await http_client.post(
+                    self._model_url(model, "generateContent"),
+                    headers=headers,
+                    content=body,
+                    timeout=httpx.Timeout(timeout, connect=GEMINI_CONNECT_TIMEOUT)
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                # Nothing was generated yet, so these are safe to retry
+                if not retries_left:
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"AI service unavailable: {str(e)}"
+                    )
+            except httpx.ReadTimeout:
+                # Already waited out a whole generation; don't repeat it on this model
+                raise
+            except httpx.RequestError as e:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"AI service unavailable: {str(e)}"
+                )
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or not retries_left:
+                    break
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error from AI service: {response.text}"
+            )
+        
+        self._latencies[profile].append(time.monotonic() - started)
+        try:
+            ai_response = orjson.loads(response.content)
+            return ai_response["candidates"][0]["content"]["parts"][0]["text"]
+        except Exception:
+            raise HTTPException(
+                status_code=500,
+                detail="Unexpected Gemini API response format"
+            )
+    
+    async def stream_gemini_api(
+        self,
+        prompt: str,
+        timeout: int = 60,
+        api_key: Optional[str] = None,
+        response_schema: Optional[dict] = None,
+        max_output_tokens: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream Gemini response text as it is generated (streamGenerateContent over SSE).
+        
+        Args:
+            prompt: Input prompt
+            timeout: Request timeout in seconds
+            api_key: Optional Gemini API key (user's key or settings)
+            response_schema: Optional JSON schema; when set, Gemini returns JSON of this shape
+            max_output_tokens: Optional cap on generated tokens (thinking included)
+            model: Optional model name (defaults to settings.gemini_model)
+            
+        Yields:
+            API response text chunks
+            
+        Raises:
+            HTTPException: If API call fails before any text was produced
+        """
+        headers, json_body = self._build_gemini_request(prompt, api_key, response_schema, max_output_tokens)
+        
+        try:
+            async for text in stream_gemini_text(
+                self._model_url(model, "streamGenerateContent"),
+                headers=headers,
+                content=orjson.dumps(json_body),
+                timeout=httpx.Timeout(timeout, connect=GEMINI_CONNECT_TIMEOUT)
+            ):
+                yield text
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error from AI service: {e.response.text}"
+            )
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"AI service unavailable: {str(e)}"
+            )
+    
+    async def analyze_resume(self, resume_text: str, job_description: str, user_id: str) -> dict:
+        """
+        Analyze resume against job description.
+        
+        Args:
+            resume_text: Extracted resume text
+            job_description: Job description text
+            user_id: User ID for usage limits
+            
+        Returns:
+            Analysis result dictionary
+        """
+        # Check usage limit
+        await usage_limit_service.check_resume_limit_async(user_id)
         
-        user_api_key = auth_service.get_gemini_api_key(user_id)
-        result = self.call_gemini_api(resume_prompt, timeout=60, api_key=user_api_key)
-        cleaned_result = result.strip()
-        cleaned_result = re.sub(r"^```(json)?|```$", "", cleaned_result, flags=re.IGNORECASE).strip()
+        analysis_prompt = self._build_analysis_prompt(resume_text, job_description)
+        user_api_key = await auth_service.get_gemini_api_key_async(user_id)
+        analysis_result = await self.call_gemini_api(
+            analysis_prompt,
+            timeout=60,
+            api_key=user_api_key,
+            response_schema=ANALYSIS_SCHEMA,
+            max_output_tokens=settings.resume_analysis_max_output_tokens
+        )
         
         # Increment usage count
-        usage_limit_service.increment_resume_count(user_id)
+        await usage_limit_service.increment_resume_count_async(user_id)
+        
+        return self._build_analysis_result(analysis_result, resume_text, job_description)
+    
+    def _build_analysis_prompt(self, resume_text: str, job_description: str) -> str:
+        """Build the resume/JD analysis prompt."""
+        resume_text = _clip(resume_text, settings.resume_prompt_max_chars)
+        job_description = _clip(job_description, settings.job_description_prompt_max_chars)
+        return ANALYSIS_PROMPT_TEMPLATE.format(resume_text=resume_text, job_description=job_description)
+    
+    def _build_analysis_result(self, analysis_result: str, resume_text: str, job_description: str) -> dict:
+        """Build the analysis response from the raw Gemini output."""
+        return {
+            "analysis": analysis_result.strip(),
+            "resume_text": resume_text,
+            "job_description": job_description
+        }
+    
+    async def _singleflight(self, key: tuple, call: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Run call once per key at a time; concurrent callers with the same key await its result.
         
+        Args:
+            key: Identity of the work; must include the user when call does per-user work
+            call: Coroutine function producing the result
+            
+        Returns:
+            Result of the shared call
+        """
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                # Shielded so a disconnecting follower doesn't cancel the shared result
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only our own cancellation propagates; if the leader was cancelled
+                # (its client disconnected), retry and possibly lead the call ourselves
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
         try:
-            return json.loads(cleaned_result)
-        except json.JSONDecodeError:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so followerless failures aren't logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _content_digest(self, data: bytes) -> bytes:
+        """Hash content for cache keys."""
+        return hashlib.blake2b(data, digest_size=16).digest()
+    
+    def _analysis_cache_key(self, resume_digest: bytes, job_description: str, max_pages: Optional[int]) -> tuple:
+        """Content-address a resume/JD pair and the number of pages analyzed."""
+        return (resume_digest, self._content_digest(str(job_description).encode()), max_pages)
+    
+    async def _get_resume_text(self, content: bytes, resume_digest: bytes, max_pages: Optional[int]) -> str:
+        """
+        Extract resume text off the event loop, reusing text already extracted from the same PDF.
+        
+        Args:
+            content: Resume PDF bytes
+            resume_digest: Content digest of the PDF
+            max_pages: Optional number of leading pages to extract
+            
+        Returns:
+            Extracted resume text
+        """
+        cache_key = (resume_digest, max_pages)
+        with self._resume_texts_lock:
+            resume_text = self.resume_texts.get(cache_key)
+        if resume_text is None:
+            # MuPDF parsing is blocking C code, so keep it off the event loop
+            resume_text = await run_in_threadpool(self.extract_resume_text, content, max_pages)
+            with self._resume_texts_lock:
+                self.resume_texts[cache_key] = resume_text
+        return resume_text
+    
+    async def compare_resume(
+        self,
+        content: bytes,
+        job_description: str,
+        user_id: str,
+        max_pages: Optional[int] = None
+    ) -> dict:
+        """
+        Analyze an uploaded resume PDF against a job description, reusing prior results.
+        
+        Args:
+            content: Resume PDF bytes
+            job_description: Job description text
+            user_id: User ID for usage limits
+            max_pages: Optional number of leading resume pages to analyze
+            
+        Returns:
+            Analysis result dictionary
+        """
+        resume_digest = self._content_digest(content)
+        cache_key = self._analysis_cache_key(resume_digest, job_description, max_pages)
+        with self._analyses_lock:
+            cached = self.analyses.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        async def analyze() -> dict:
+            resume_text = await self._get_resume_text(content, resume_digest, max_pages)
+            result = await self.analyze_resume(resume_text, job_description, user_id)
+            with self._analyses_lock:
+                self.analyses[cache_key] = result
+            return result
+        
+        # Identical submissions racing each other share one Gemini call. The call checks,
+        # bills and uses the key of one user, so only that user's requests may share it.
+        return await self._singleflight(("analysis", user_id, cache_key), analyze)
+    
+    async def stream_compare_resume(
+        self,
+        content: bytes,
+        job_description: str,
+        user_id: str,
+        max_pages: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Analyze an uploaded resume PDF against a job description, streaming the analysis as server-sent events.
+        
+        Parsing and the usage check run before this returns, so those errors surface
+        as normal HTTP errors rather than mid-stream.
+        
+        Args:
+            content: Resume PDF bytes
+            job_description: Job description text
+            user_id: User ID for usage limits
+            max_pages: Optional number of leading resume pages to analyze
+            
+        Returns:
+            Async iterator of SSE events: text chunks, then a final event with
+            done=true and the same fields as compare_resume
+        """
+        resume_digest = self._content_digest(content)
+        cache_key = self._analysis_cache_key(resume_digest, job_description, max_pages)
+        with self._analyses_lock:
+            cached = self.analyses.get(cache_key)
+        if cached is not None:
+            return self._stream_cached(cached)
+        
+        resume_text = await self._get_resume_text(content, resume_digest, max_pages)
+        await usage_limit_service.check_resume_limit_async(user_id)
+        user_api_key = await auth_service.get_gemini_api_key_async(user_id)
+        prompt = self._build_analysis_prompt(resume_text, job_description)
+        return self._stream_analysis(cache_key, prompt, resume_text, job_description, user_id, user_api_key)
+    
+    async def _stream_cached(self, result: dict) -> AsyncIterator[bytes]:
+        """Send a cached result as the final SSE event."""
+        yield sse_event({"done": True, **result})
+    
+    async def _stream_analysis(
+        self,
+        cache_key: tuple,
+        prompt: str,
+        resume_text: str,
+        job_description: str,
+        user_id: str,
+        api_key: Optional[str]
+    ) -> AsyncIterator[bytes]:
+        """Forward Gemini chunks as SSE events, then send and cache the full analysis."""
+        parts = []
+        try:
+            async for text in self.stream_gemini_api(
+                prompt,
+                timeout=60,
+                api_key=api_key,
+                response_schema=ANALYSIS_SCHEMA,
+                max_output_tokens=settings.resume_analysis_max_output_tokens
+            ):
+                parts.append(text)
+                yield sse_event({"text": text})
+        except HTTPException as e:
+            # Headers are already sent, so the error becomes the final event
+            yield sse_event({"done": True, "error": e.detail})
+            return
+        
+        await usage_limit_service.increment_resume_count_async(user_id)
+        result = self._build_analysis_result("".join(parts), resume_text, job_description)
+        with self._analyses_lock:
+            self.analyses[cache_key] = result
+        yield sse_event({"done": True, **result})
+    
+    async def compare_resumes(
+        self,
+        files: list[tuple[str, bytes]],
+        job_description: str,
+        user_id: str,
+        max_pages: Optional[int] = None
+    ) -> dict:
+        """
+        Analyze several resume PDFs against one job description in a single Gemini call.
+        
+        The job description is sent once for the whole batch instead of once per resume.
+        Each resume counts towards the usage limit.
+        
+        Args:
+            files: (filename, PDF bytes) per resume
+            job_description: Job description text
+            user_id: User ID for usage limits
+            max_pages: Optional number of leading pages to analyze per resume
+            
+        Returns:
+            Dictionary with the job description and one result per resume, in upload order
+            
+        Raises:
+            HTTPException: If a PDF cannot be parsed or Gemini returns the wrong number of analyses
+        """
+        await usage_limit_service.check_resume_limit_async(user_id, requested=len(files))
+        
+        resume_texts = await asyncio.gather(
+            *(
+                self._get_resume_text(content, self._content_digest(content), max_pages)
+                for _, content in files
+            )
+        )
+        resumes = "\n\n---\n\n".join(
+            f"### Candidate Resume {i}:\n{_clip(text, settings.resume_prompt_max_chars)}"
+            for i, text in enumerate(resume_texts, start=1)
+        )
+        prompt = BATCH_ANALYSIS_PROMPT_TEMPLATE.format(
+            resume_count=len(files),
+            job_description=_clip(job_description, settings.job_description_prompt_max_chars),
+            resumes=resumes
+        )
+        
+        user_api_key = await auth_service.get_gemini_api_key_async(user_id)
+        result = await self.call_gemini_api(
+            prompt,
+            timeout=120,
+            api_key=user_api_key,
+            response_schema=BATCH_ANALYSIS_SCHEMA,
+            max_output_tokens=settings.resume_analysis_max_output_tokens * len(files)
+        )
+        try:
+            analyses = orjson.loads(result)
+        except orjson.JSONDecodeError:
+            analyses = None
+        if not isinstance(analyses, list) or len(analyses) != len(files):
+            raise HTTPException(
+                status_code=500,
+                detail="AI service returned an incomplete batch analysis"
+            )
+        
+        # Increment usage count
+        await usage_limit_service.increment_resume_count_async(user_id, count=len(files))
+        
+        return {
+            "job_description": job_description,
+            "results": [
+                {
+                    "filename": filename,
+                    "analysis": orjson.dumps(analysis).decode(),
+                    "resume_text": resume_text
+                }
+                for (filename, _), analysis, resume_text in zip(files, analyses, resume_texts)
+            ]
+        }
+    
+    async def generate_resume(self, resume_type: str, resume_text: str, user_id: str, job_description: str = "") -> dict:
+        """
+        Generate/formatted resume JSON.
+        
+        Args:
+            resume_type: Type of resume generation ("jd_resume" or other)
+            resume_text: Original resume text
+            user_id: User ID for usage limits
+            job_description: Job description (for JD-tailored resumes)
+            
+        Returns:
+            Generated resume JSON structure
+            
+        Raises:
+            HTTPException: If generation fails
+        """
+        resume_prompt = self._build_resume_prompt(resume_type, resume_text, job_description)
+        cache_key = self._content_digest(resume_prompt.encode())
+        with self._generated_resumes_lock:
+            cached = self.generated_resumes.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        async def generate() -> dict:
+            # Check usage limit
+            await usage_limit_service.check_resume_limit_async(user_id)
+            
+            user_api_key = await auth_service.get_gemini_api_key_async(user_id)
+            result = await self.call_gemini_api(
+                resume_prompt,
+                timeout=60,
+                api_key=user_api_key,
+                response_schema=self._resume_schema(resume_type),
+                max_output_tokens=settings.resume_generation_max_output_tokens,
+                model=self._resume_model(resume_type)
+            )
+            resume = self._parse_resume_json(result)
+            
+            # Increment usage count
+            await usage_limit_service.increment_resume_count_async(user_id)
+            
+            with self._generated_resumes_lock:
+                self.generated_resumes[cache_key] = resume
+            return resume
+        
+        # Repeated clicks racing each other share one Gemini call; per user, since the
+        # call checks and bills that user's usage and uses their API key
+        return await self._singleflight(("resume", user_id, cache_key), generate)
+    
+    async def stream_generate_resume(
+        self,
+        resume_type: str,
+        resume_text: str,
+        user_id: str,
+        job_description: str = ""
+    ) -> AsyncIterator[bytes]:
+        """
+        Generate/formatted resume JSON, streaming Gemini output as server-sent events.
+        
+        The usage check runs before this returns, so it surfaces as a normal HTTP error.
+        
+        Args:
+            resume_type: Type of resume generation ("jd_resume" or other)
+            resume_text: Original resume text
+            user_id: User ID for usage limits
+            job_description: Job description (for JD-tailored resumes)
+            
+        Returns:
+            Async iterator of SSE events: raw text chunks, then a final event with
+            done=true and the parsed resume under "resume"
+        """
+        resume_prompt = self._build_resume_prompt(resume_type, resume_text, job_description)
+        cache_key = self._content_digest(resume_prompt.encode())
+        with self._generated_resumes_lock:
+            cached = self.generated_resumes.get(cache_key)
+        if cached is not None:
+            return self._stream_cached({"resume": cached})
+        
+        await usage_limit_service.check_resume_limit_async(user_id)
+        user_api_key = await auth_service.get_gemini_api_key_async(user_id)
+        return self._stream_resume(cache_key, resume_prompt, resume_type, user_id, user_api_key)
+    
+    async def _stream_resume(
+        self,
+        cache_key: bytes,
+        prompt: str,
+        resume_type: str,
+        user_id: str,
+        api_key: Optional[str]
+    ) -> AsyncIterator[bytes]:
+        """Forward Gemini chunks as SSE events, then send and cache the parsed resume."""
+        parts = []
+        try:
+            async for text in self.stream_gemini_api(
+                prompt,
+                timeout=60,
+                api_key=api_key,
+                response_schema=self._resume_schema(resume_type),
+                max_output_tokens=settings.resume_generation_max_output_tokens,
+                model=self._resume_model(resume_type)
+            ):
+                parts.append(text)
+                yield sse_event({"text": text})
+            
+            await usage_limit_service.increment_resume_count_async(user_id)
+            resume = self._parse_resume_json("".join(parts))
+        except HTTPException as e:
+            # Headers are already sent, so the error becomes the final event
+            yield sse_event({"done": True, "error": e.detail})
+            return
+        
+        with self._generated_resumes_lock:
+            self.generated_resumes[cache_key] = resume
+        yield sse_event({"done": True, "resume": resume})
+    
+    def _resume_schema(self, resume_type: str) -> dict:
+        """Get the JSON mode schema for the requested resume type."""
+        return JD_RESUME_SCHEMA if resume_type == "jd_resume" else RESUME_SCHEMA
+    
+    def _resume_model(self, resume_type: str) -> str:
+        """
+        Get the model for the requested resume type.
+        
+        Tailoring to a JD needs the full model; polishing an existing resume only
+        restructures and copy-edits it, which the faster polish model handles.
+        """
+        return self.model if resume_type == "jd_resume" else settings.gemini_resume_polish_model
+    
+    def _parse_resume_json(self, result: str) -> dict:
+        """
+        Parse generated resume JSON from the Gemini JSON mode output.
+        
+        Raises:
+            HTTPException: If the output is not valid JSON (e.g. cut off at the output token limit)
+        """
+        try:
+            return orjson.loads(result)
+        except orjson.JSONDecodeError:
             raise HTTPException(
                 status_code=500,
                 detail="Failed to parse AI response as JSON"
             )
+    
+    def _build_resume_prompt(self, resume_type: str, resume_text: str, job_description: str) -> str:
+        """Build the resume generation prompt for the requested resume type."""
+        resume_text = _clip(resume_text, settings.resume_prompt_max_chars)
+        job_description = _clip(job_description, settings.job_description_prompt_max_chars)
+        if resume_type == "jd_resume":
+            return JD_RESUME_PROMPT_TEMPLATE.format(resume_text=resume_text, job_description=job_description)
+        return RESUME_PROMPT_TEMPLATE.format(resume_text=resume_text)
 
 
 # Singleton instance
@@ -2,7 +2,7 @@
 from typing import Optional
 from fastapi import HTTPException
 from firebase_admin import firestore
-from app.db.firestore_client import get_firestore_db
+from app.db.firestore_client import get_firestore_db, get_async_firestore_db
 
 
 class UsageLimitService:
@@ -16,13 +16,19 @@ class UsageLimitService:
 
     def __init__(self):
         self.db = get_firestore_db()
+        # Collection references are reused across requests
+        self.users_ref = self.db.collection("users")
+        self.sessions_ref = self.db.collection("sessions")
+        # Async client for checks made from async request paths
+        self.async_db = get_async_firestore_db()
+        self.async_users_ref = self.async_db.collection("users")
 
     def is_admin(self, user_id: str) -> bool:
         """Check if user has admin role."""
         try:
             if not user_id:
                 return False
-            user_doc = self.db.collection("users").document(user_id).get()
+            user_doc = self.users_ref.document(user_id).get()
             if user_doc.exists:
                 data = user_doc.to_dict()
                 return data.get("role") == "admin"
@@ -35,9 +41,8 @@ class UsageLimitService:
         if self.is_admin(user_id):
             return
 
-        sessions_ref = self.db.collection("sessions")
         # Query sessions belonging to user
-        query = sessions_ref.where("user_id", "==", user_id).stream()
+        query = self.sessions_ref.where("user_id", "==", user_id).stream()
         count = sum(1 for _ in query)
         
         if count >= self.MAX_SESSIONS:
@@ -51,7 +56,7 @@ class UsageLimitService:
         if user_id and self.is_admin(user_id):
             return
 
-        messages_ref = self.db.collection("sessions").document(session_id).collection("messages")
+        messages_ref = self.sessions_ref.document(session_id).collection("messages")
         # Efficiently count messages
         count = len(list(messages_ref.stream()))
         
@@ -76,28 +81,49 @@ class UsageLimitService:
                 detail=f"Document limit reached: You can only upload up to {self.MAX_DOCUMENTS} documents on the free tier."
             )
 
-    def check_resume_limit(self, user_id: str):
-        """Check if user has reached max resume generations (2)."""
+    def check_resume_limit(self, user_id: str, requested: int = 1):
+        """Check if user has room for `requested` more resume generations (max 2)."""
         if self.is_admin(user_id):
             return
 
-        user_ref = self.db.collection("users").document(user_id)
+        user_ref = self.users_ref.document(user_id)
         user_doc = user_ref.get()
         
         if user_doc.exists:
             data = user_doc.to_dict()
             count = data.get("resume_generation_count", 0)
-            if count >= self.MAX_RESUME_GENERATIONS:
+            if count + requested > self.MAX_RESUME_GENERATIONS:
                 raise HTTPException(
                     status_code=403,
                     detail=f"Resume limit reached: You can only generate/analyze up to {self.MAX_RESUME_GENERATIONS} resumes on the free tier."
                 )
         return user_ref
 
+    async def check_resume_limit_async(self, user_id: str, requested: int = 1):
+        """
+        Async check_resume_limit for async request paths.
+        
+        Role and count come from the same user document, so it is read once.
+        """
+        user_doc = await self.async_users_ref.document(user_id).get()
+        if not user_doc.exists:
+            return
+        
+        data = user_doc.to_dict()
+        if data.get("role") == "admin":
+            return
+        
+        count = data.get("resume_generation_count", 0)
+        if count + requested > self.MAX_RESUME_GENERATIONS:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Resume limit reached: You can only generate/analyze up to {self.MAX_RESUME_GENERATIONS} resumes on the free tier."
+            )
+
     def get_user_usage(self, user_id: str) -> dict:
         """Get usage statistics for a user."""
         # Sessions count
-        sessions_query = self.db.collection("sessions").where("user_id", "==", user_id).stream()
+        sessions_query = self.sessions_ref.where("user_id", "==", user_id).stream()
         sessions_count = sum(1 for _ in sessions_query)
         
         # Documents count
@@ -105,7 +131,7 @@ class UsageLimitService:
         docs_count = sum(1 for _ in docs_query)
         
         # Resume count
-        user_doc = self.db.collection("users").document(user_id).get()
+        user_doc = self.users_ref.document(user_id).get()
         resume_count = 0
         role = "user"
         if user_doc.exists:
@@ -139,7 +165,7 @@ class UsageLimitService:
             raise HTTPException(status_code=403, detail="Only admins can reset usage limits")
         
         # Reset resume count in user document
-        user_ref = self.db.collection("users").document(target_user_id)
+        user_ref = self.users_ref.document(target_user_id)
         if user_ref.get().exists:
             user_ref.update({
                 "resume_generation_count": 0,
@@ -153,10 +179,10 @@ class UsageLimitService:
         if not self.is_admin(admin_user_id):
             raise HTTPException(status_code=403, detail="Only admins can view all users usage")
             
-        users_ref = self.db.collection("users").limit(limit).stream()
+        user_docs = self.users_ref.limit(limit).stream()
         users_usage = []
         
-        for user_doc in users_ref:
+        for user_doc in user_docs:
             user_id = user_doc.id
             usage = self.get_user_usage(user_id)
             user_data = user_doc.to_dict()
@@ -166,11 +192,19 @@ class UsageLimitService:
             
         return users_usage
 
-    def increment_resume_count(self, user_id: str):
+    def increment_resume_count(self, user_id: str, count: int = 1):
         """Increment the resume generation counter for a user."""
-        user_ref = self.db.collection("users").document(user_id)
+        user_ref = self.users_ref.document(user_id)
         user_ref.update({
-            "resume_generation_count": firestore.Increment(1),
+            "resume_generation_count": firestore.Increment(count),
+            "updated_at": firestore.SERVER_TIMESTAMP
+        })
+
+
+    async def increment_resume_count_async(self, user_id: str, count: int = 1):
+        """Async increment_resume_count for async request paths."""
+        await self.async_users_ref.document(user_id).update({
+            "resume_generation_count": firestore.Increment(count),
             "updated_at": firestore.SERVER_TIMESTAMP
         })
 
@@ -0,0 +1,12 @@
+"""Test configuration: keep service singletons from connecting to Firebase on import."""
+import os
+from unittest import mock
+
+os.environ.setdefault("GEMINI_API_KEY", "test-gemini-key")
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS_JSON", "{}")
+os.environ.setdefault("FIREBASE_PROJECT_ID", "test-project")
+
+# Service modules create Firestore clients when they are imported
+mock.patch("google.oauth2.service_account.Credentials.from_service_account_info").start()
+mock.patch("google.cloud.firestore.Client").start()
+mock.patch("google.cloud.firestore.AsyncClient").start()
@@ -0,0 +1,65 @@
+"""GeminiEmbeddings async query coalescing."""
+import asyncio
+from unittest import mock
+import numpy as np
+import pytest
+from cachetools import LRUCache
+from app.core import gemini_embeddings as embeddings_module
+from app.core.gemini_embeddings import GeminiEmbeddings
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    """Embeddings with an empty cache and mocked Gemini requests."""
+    monkeypatch.setattr(embeddings_module, "_embedding_cache", LRUCache(maxsize=100))
+    instance = GeminiEmbeddings()
+    instance._aembed_text = mock.AsyncMock(side_effect=lambda text: [float(len(text))])
+    instance._aembed_batch = mock.AsyncMock(side_effect=lambda texts: [[float(len(text))] for text in texts])
+    return instance
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_batch(embeddings):
+    vectors = await asyncio.gather(*(embeddings.aembed_query(text) for text in ["a", "bb", "ccc"]))
+
+    embeddings._aembed_batch.assert_awaited_once_with(["a", "bb", "ccc"])
+    embeddings._aembed_text.assert_not_awaited()
+    # Each caller gets the vector for its own text
+    assert [float(vector[0]) for vector in vectors] == [1.0, 2.0, 3.0]
+
+
+@pytest.mark.asyncio
+async def test_lone_query_uses_single_request(embeddings):
+    vector = await embeddings.aembed_query("solo")
+
+    embeddings._aembed_text.assert_awaited_once_with("solo")
+    embeddings._aembed_batch.assert_not_awaited()
+    assert isinstance(vector, np.ndarray) and float(vector[0]) == 4.0
+
+
+@pytest.mark.asyncio
+async def test_batch_error_reaches_every_caller(embeddings):
+    embeddings._aembed_batch.side_effect = RuntimeError("quota exceeded")
+
+    results = await asyncio.gather(
+        embeddings.aembed_query("a"),
+        embeddings.aembed_query("b"),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # Failures are not cached; a retry embeds again
+    embeddings._aembed_batch.side_effect = None
+    assert float((await embeddings.aembed_query("a"))[0]) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_strand_the_batch(embeddings):
+    first = asyncio.ensure_future(embeddings.aembed_query("a"))
+    second = asyncio.ensure_future(embeddings.aembed_query("bb"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert float((await second)[0]) == 2.0
+    with pytest.raises(asyncio.CancelledError):
+        await first
@@ -0,0 +1,28 @@
+"""Resume PDF text extraction limits."""
+import fitz
+import pytest
+from fastapi import HTTPException
+from app.services import resume_service as resume_module
+from app.services.resume_service import ResumeService
+
+
+def make_pdf(pages: int) -> bytes:
+    """Build a PDF with one line of text per page."""
+    with fitz.open() as pdf:
+        for i in range(pages):
+            pdf.new_page().insert_text((72, 72), f"Page {i}")
+        return pdf.tobytes()
+
+
+def test_reads_only_leading_pages():
+    text = ResumeService().extract_resume_text(make_pdf(5), max_pages=2)
+    assert "Page 0" in text and "Page 1" in text
+    assert "Page 2" not in text
+
+
+def test_rejects_pdf_over_page_cap_even_with_max_pages(monkeypatch):
+    capped = resume_module.settings.model_copy(update={"resume_max_pages": 3})
+    monkeypatch.setattr(resume_module, "settings", capped)
+    with pytest.raises(HTTPException) as exc_info:
+        ResumeService().extract_resume_text(make_pdf(4), max_pages=1)
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,104 @@
+"""Concurrent identical resume requests share one Gemini call, per user."""
+import asyncio
+from unittest import mock
+import orjson
+import pytest
+from fastapi import HTTPException
+from app.services import resume_service as resume_module
+from app.services.resume_service import ResumeService
+
+
+RESUME_JSON = orjson.dumps({"name": "Jane Doe"}).decode()
+
+
+@pytest.fixture
+def service():
+    return ResumeService()
+
+
+@pytest.fixture
+def usage():
+    """Usage limits where "blocked" is over its limit; increments are recorded."""
+    async def check_resume_limit_async(user_id, requested=1):
+        # A Firestore read: long enough for a concurrent request to arrive
+        await asyncio.sleep(0.01)
+        if user_id == "blocked":
+            raise HTTPException(status_code=403, detail="Resume limit reached")
+
+    with mock.patch.object(resume_module, "usage_limit_service") as usage_limit_service:
+        usage_limit_service.check_resume_limit_async = mock.AsyncMock(side_effect=check_resume_limit_async)
+        usage_limit_service.increment_resume_count_async = mock.AsyncMock()
+        with mock.patch.object(resume_module, "auth_service") as auth_service:
+            auth_service.get_gemini_api_key_async = mock.AsyncMock(side_effect=lambda user_id: f"key-{user_id}")
+            yield usage_limit_service
+
+
+def slow_gemini(service):
+    """Patch call_gemini_api with a slow call so concurrent requests overlap."""
+    async def call_gemini_api(prompt, **kwargs):
+        await asyncio.sleep(0.05)
+        return RESUME_JSON
+
+    return mock.patch.object(service, "call_gemini_api", mock.AsyncMock(side_effect=call_gemini_api))
+
+
+@pytest.mark.asyncio
+async def test_same_user_shares_one_call(service, usage):
+    with slow_gemini(service) as call_gemini_api:
+        results = await asyncio.gather(
+            service.generate_resume("resume", "text", "alice"),
+            service.generate_resume("resume", "text", "alice")
+        )
+
+    assert results[0] == results[1] == {"name": "Jane Doe"}
+    assert call_gemini_api.await_count == 1
+    usage.increment_resume_count_async.assert_awaited_once_with("alice")
+
+
+@pytest.mark.asyncio
+async def test_leader_limit_error_does_not_reach_other_user(service, usage):
+    with slow_gemini(service) as call_gemini_api:
+        blocked, allowed = await asyncio.gather(
+            service.generate_resume("resume", "text", "blocked"),
+            service.generate_resume("resume", "text", "bob"),
+            return_exceptions=True
+        )
+
+    assert isinstance(blocked, HTTPException) and blocked.status_code == 403
+    assert allowed == {"name": "Jane Doe"}
+    assert call_gemini_api.await_args.kwargs["api_key"] == "key-bob"
+    usage.increment_resume_count_async.assert_awaited_once_with("bob")
+
+
+@pytest.mark.asyncio
+async def test_each_user_is_checked_and_billed(service, usage):
+    with slow_gemini(service) as call_gemini_api:
+        await asyncio.gather(
+            service.generate_resume("resume", "text", "alice"),
+            service.generate_resume("resume", "text", "bob")
+        )
+
+    assert call_gemini_api.await_count == 2
+    assert {c.args[0] for c in usage.check_resume_limit_async.await_args_list} == {"alice", "bob"}
+    assert {c.args[0] for c in usage.increment_resume_count_async.await_args_list} == {"alice", "bob"}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over_to_follower(service):
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"call": calls}
+
+    leader = asyncio.create_task(service._singleflight(("k",), work))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(service._singleflight(("k",), work)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == [{"call": 2}] * 3
+    with pytest.raises(asyncio.CancelledError):
+        await leader
@@ -0,0 +1,82 @@
+"""DocumentVectorStore search ordering and persistence."""
+import faiss
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.core.vector_store import DocumentVectorStore
+
+
+# Chunk vectors: "near" and "near copy" are almost identical, "aside" is related but different
+CHUNKS = {
+    "near": [1.0, 0.0, 0.0],
+    "near copy": [0.98, -0.2, 0.0],
+    "aside": [0.6, 0.0, 0.8],
+    "far": [0.0, -1.0, 0.0],
+}
+QUERY = [0.9, 0.1, 0.4]
+
+
+class FakeEmbeddings(Embeddings):
+    """Returns QUERY for every query."""
+
+    def embed_documents(self, texts):
+        return [CHUNKS[text] for text in texts]
+
+    def embed_query(self, text):
+        return QUERY
+
+    async def aembed_query(self, text):
+        return QUERY
+
+
+def make_store() -> DocumentVectorStore:
+    """Build a store with one chunk per CHUNKS entry."""
+    vectors = np.asarray(list(CHUNKS.values()), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    documents = [Document(page_content=text, metadata={"chunk": i}) for i, text in enumerate(CHUNKS)]
+    return DocumentVectorStore.from_vectors(faiss.IndexFlatL2(3), vectors, documents, FakeEmbeddings())
+
+
+def contents(documents):
+    return [doc.page_content for doc in documents]
+
+
+def test_similarity_search_orders_by_cosine_similarity():
+    assert contents(make_store().similarity_search("q", k=3)) == ["near", "near copy", "aside"]
+
+
+def test_similarity_search_caps_k_at_store_size():
+    assert len(make_store().similarity_search("q", k=10)) == len(CHUNKS)
+
+
+def test_mmr_prefers_diverse_chunk_over_near_duplicate():
+    store = make_store()
+    assert contents(store.max_marginal_relevance_search("q", k=2, fetch_k=4, lambda_mult=0.5)) == ["near", "aside"]
+    # Relevance only falls back to plain similarity order
+    assert contents(store.max_marginal_relevance_search("q", k=2, fetch_k=4, lambda_mult=1.0)) == ["near", "near copy"]
+
+
+@pytest.mark.asyncio
+async def test_async_searches_match_sync():
+    store = make_store()
+    assert contents(await store.asimilarity_search("q", k=3)) == contents(store.similarity_search("q", k=3))
+    assert contents(await store.amax_marginal_relevance_search("q", k=2, fetch_k=4)) == contents(
+        store.max_marginal_relevance_search("q", k=2, fetch_k=4)
+    )
+
+
+def test_save_load_round_trip(tmp_path):
+    store = make_store()
+    store.save(str(tmp_path / "store"))
+
+    loaded = DocumentVectorStore.load(str(tmp_path / "store"), FakeEmbeddings())
+
+    assert loaded.texts == store.texts
+    assert loaded.metadatas == store.metadatas
+    assert loaded.index.ntotal == store.index.ntotal
+    assert contents(loaded.max_marginal_relevance_search("q", k=2, fetch_k=4)) == ["near", "aside"]
+
+
+def test_load_missing_store_returns_none(tmp_path):
+    assert DocumentVectorStore.load(str(tmp_path / "missing"), FakeEmbeddings()) is None